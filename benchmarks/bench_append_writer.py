@@ -0,0 +1,82 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Sustained records/sec, p99 enqueue latency & dropped/blocked counts of `AppendWriter`,
+next to `FileHandler` appends from the same producer threads.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_append_writer.py --producers 8 --records 20000
+"""
+
+from argparse import ArgumentParser
+from os.path import join
+from tempfile import mkdtemp
+from threading import Barrier, Thread
+from time import perf_counter
+
+from customlib.filehandlers import AppendWriter, FileHandler
+
+
+def produce(producers: int, records: int, write) -> float:
+    """Return the records/sec of `producers` threads calling `write` `records` times each."""
+    barrier = Barrier(producers + 1)
+
+    def producer(index: int):
+        barrier.wait()
+        for number in range(records):
+            write(f"producer {index} record {number}\n")
+
+    threads = [Thread(target=producer, args=(index,)) for index in range(producers)]
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+    started = perf_counter()
+    for thread in threads:
+        thread.join()
+    return producers * records / (perf_counter() - started)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--producers", type=int, default=8)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--baseline-records", type=int, default=200, help="per producer, with FileHandler")
+    args = parser.parse_args()
+
+    folder = mkdtemp()
+    print(f"{args.producers} producers")
+
+    handler = FileHandler(join(folder, "handler.log"), "a", encoding="UTF-8")
+    handler.close()
+
+    def append(record: str):
+        with handler as handle:
+            handle.write(record)
+
+    rate = produce(args.producers, args.baseline_records, append)
+    print(f"  FileHandler (fsync per write)   {rate:>10.0f} records/sec")
+
+    cases = (
+        ("AppendWriter, block", {"block": True, "high_water": 4096}),
+        ("AppendWriter, drop", {"block": False, "high_water": 4096}),
+        ("AppendWriter, no fsync", {"sync": False}),
+    )
+    for label, options in cases:
+        writer = AppendWriter(join(folder, "writer.log"), **options)
+        started = perf_counter()
+        enqueued = produce(args.producers, args.records, writer.write)
+        writer.close()
+        elapsed = perf_counter() - started
+
+        stats = writer.stats()
+        sustained = stats["written"] / elapsed
+        print(
+            f"  {label:<31} {sustained:>10.0f} written/sec sustained ({enqueued:.0f} enqueue calls/sec), "
+            f"p99 enqueue {stats['p99_enqueue'] * 1e6:.1f} us, "
+            f"dropped {stats['dropped']}, blocked {stats['blocked']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
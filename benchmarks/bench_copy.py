@@ -0,0 +1,65 @@
+# -*- coding: UTF-8 -*-
+
+"""
+`FileHandler.copy_to` (kernel space copy) against a read/write loop through Python memory.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_copy.py --size-mb 1024 --runs 3
+"""
+
+from argparse import ArgumentParser
+from os import remove
+from os.path import join
+from tempfile import mkdtemp
+from time import perf_counter, process_time
+
+from customlib.filehandlers import FileHandler
+from customlib.filehandlers.constants import CHUNK_SIZE
+
+
+def read_write(source: str, target: str):
+    reader = FileHandler(source, "rb")
+    with reader as src, FileHandler(target, "wb") as dst:
+        while True:
+            chunk = src.read(CHUNK_SIZE)
+            if len(chunk) == 0:
+                break
+            dst.write(chunk)
+
+
+def copy_to(source: str, target: str):
+    reader = FileHandler(source, "rb")
+    with reader:
+        reader.copy_to(target)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--directory", default=None, help="where the files are written (its disk matters)")
+    args = parser.parse_args()
+
+    folder = args.directory or mkdtemp()
+    source, target = join(folder, "source.bin"), join(folder, "target.bin")
+
+    block = bytes(range(256)) * 4096
+    with open(source, "wb") as handle:
+        for _ in range(args.size_mb):
+            handle.write(block)
+
+    print(f"{args.size_mb} MiB copy (the targets are fsynced on close)")
+    try:
+        for label, func in (("read/write loop", read_write), ("copy_to", copy_to)):
+            for run in range(args.runs):
+                wall, cpu = perf_counter(), process_time()
+                func(source, target)
+                wall, cpu = perf_counter() - wall, process_time() - cpu
+                print(f"  {label:<16} run {run + 1}: wall {wall:.2f}s, cpu {cpu:.2f}s, {args.size_mb / wall:.0f} MiB/s")
+                remove(target)
+    finally:
+        remove(source)
+
+
+if __name__ == "__main__":
+    main()
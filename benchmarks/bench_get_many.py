@@ -0,0 +1,56 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Building many registry entries with slow (I/O bound) constructors: serial `get` vs `get_many`.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_get_many.py --entries 24 --delay 0.1
+"""
+
+from argparse import ArgumentParser
+from time import perf_counter, sleep
+
+from customlib.registry import MutableClassRegistry
+
+
+class Services(MutableClassRegistry):
+    pass
+
+
+class Slow(object):
+    """Stand-in for a constructor waiting on the network (module level, so processes can unpickle it)."""
+
+    def __init__(self, delay: float):
+        sleep(delay)
+        self.delay = delay
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=24)
+    parser.add_argument("--delay", type=float, default=0.1, help="constructor time (seconds)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[4, 8, 24])
+    args = parser.parse_args()
+
+    keys = [f"service.{number}" for number in range(args.entries)]
+    for key in keys:
+        Services.register(key)(Slow)
+    requests = {key: ((args.delay,), {}) for key in keys}
+
+    print(f"{args.entries} entries, {args.delay * 1e3:.0f} ms constructor")
+
+    started = perf_counter()
+    for key in keys:
+        Services.get(key, args.delay)
+    print(f"  {'serial get':<24} {perf_counter() - started:>8.3f} s")
+
+    for executor in ("thread", "process"):
+        for workers in args.workers:
+            started = perf_counter()
+            Services.get_many(requests, max_workers=workers, executor=executor)
+            label = f"get_many {executor} x{workers}"
+            print(f"  {label:<24} {perf_counter() - started:>8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
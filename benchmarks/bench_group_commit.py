@@ -0,0 +1,67 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Writes/sec of `FileHandler` appenders: per-close `fsync` vs group commit.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_group_commit.py --threads 16 --writes 50
+"""
+
+from argparse import ArgumentParser
+from os import remove
+from os.path import exists, join
+from tempfile import mkdtemp
+from threading import Barrier, Thread
+from time import perf_counter
+
+from customlib.filehandlers import FileHandler
+
+
+def run(path: str, threads: int, writes: int, **options) -> float:
+    """Return the writes/sec of `threads` threads appending `writes` records each through one handler."""
+    if exists(path):
+        remove(path)
+
+    handler = FileHandler(path, "a", encoding="UTF-8", **options)
+    handler.close()
+    barrier = Barrier(threads + 1)
+
+    def worker(index: int):
+        barrier.wait()
+        for number in range(writes):
+            with handler as handle:
+                handle.write(f"{index}:{number}\n")
+
+    workers = [Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+
+    barrier.wait()
+    started = perf_counter()
+    for thread in workers:
+        thread.join()
+
+    return threads * writes / (perf_counter() - started)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=50)
+    parser.add_argument("--directory", default=None, help="where the file is written (its disk matters)")
+    args = parser.parse_args()
+
+    path = join(args.directory or mkdtemp(), "bench_group_commit.log")
+    cases = (
+        ("per-close fsync", {}),
+        ("group commit", {"group_commit": True, "commit_delay": 0.0}),
+        ("group commit, 0.5 ms delay", {"group_commit": True, "commit_delay": 0.0005}),
+    )
+
+    print(f"{args.threads} threads x {args.writes} appends")
+    for label, options in cases:
+        print(f"  {label:<28} {run(path, args.threads, args.writes, **options):>10.0f} writes/sec")
+
+
+if __name__ == "__main__":
+    main()
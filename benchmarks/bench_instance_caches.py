@@ -0,0 +1,87 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Registry `get` with an expensive constructor: one instance per call vs the `shared`, `lru` & `pool` caches.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_instance_caches.py --calls 2000 --keys 16 --threads 4
+"""
+
+from argparse import ArgumentParser
+from random import Random
+from threading import Thread
+from time import perf_counter, sleep
+
+from customlib.registry import MutableClassRegistry
+
+
+class Services(MutableClassRegistry):
+    pass
+
+
+class Client(object):
+    """Stand-in for a client with an expensive set-up (connection, parsed config...)."""
+
+    cost: float = 0.001
+
+    def __init__(self, name: str = "default"):
+        sleep(self.cost)
+        self.name = name
+
+    def call(self) -> str:
+        return self.name
+
+
+POLICIES = (
+    ("per call", None, {}),
+    ("shared", "shared", {}),
+    ("lru", "lru", {"max_size": 8}),
+    ("pool (lease)", "pool", {"max_size": 4}),
+)
+
+
+def worker(key: str, calls: int, keys: int, seed: int):
+    names = Random(seed)
+    for _ in range(calls):
+        name = f"name-{names.randrange(keys)}"
+        with Services.lease(key, name) as client:
+            client.call()
+
+
+def run(key: str, calls: int, keys: int, threads: int) -> float:
+    workers = [
+        Thread(target=worker, args=(key, calls // threads, keys, seed))
+        for seed in range(threads)
+    ]
+    started = perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return perf_counter() - started
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--keys", type=int, default=16, help="distinct constructor arguments")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--cost", type=float, default=0.001, help="constructor time (seconds)")
+    args = parser.parse_args()
+
+    Client.cost = args.cost
+    print(f"{args.calls} calls, {args.keys} distinct arguments, {args.threads} threads, {args.cost * 1e3} ms constructor")
+    for label, policy, options in POLICIES:
+        key = f"client.{policy}"
+        Services.register(key, cache=policy, **options)(Client)
+        elapsed = run(key, args.calls, args.keys, args.threads)
+
+        line = f"  {label:<14} {args.calls / elapsed:>10.0f} calls/sec"
+        if policy is not None:
+            info = Services.cache_info(key)
+            line += f", hit rate {info['hit_rate']:.1%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Start-up cost of registering many plugin modules: eager import & `register` vs `register_lazy`.
+
+Each mode runs in a fresh interpreter against `--modules` generated plugin modules
+(each importing a few standard library modules), then `get`s one entry (first & cached `get`).
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_lazy_registry.py --modules 500
+"""
+
+import json
+import subprocess
+import sys
+from argparse import ArgumentParser
+from os import makedirs
+from os.path import join
+from tempfile import mkdtemp
+
+PLUGIN = """
+import json
+import decimal
+import dataclasses
+
+
+class Plugin{number}(object):
+
+    def __init__(self, value=None):
+        self.value = value
+"""
+
+RUNNER = """
+import importlib, json, sys, time
+from customlib.registry import MutableClassRegistry
+
+
+class Plugins(MutableClassRegistry):
+    pass
+
+
+started = time.perf_counter()
+for number in range({modules}):
+    name = f"bench_plugins.plugin_{{number}}"
+    if {lazy}:
+        Plugins.register_lazy(f"plugin.{{number}}", f"{{name}}:Plugin{{number}}")
+    else:
+        module = importlib.import_module(name)
+        Plugins.register(f"plugin.{{number}}")(getattr(module, f"Plugin{{number}}"))
+registered = time.perf_counter()
+Plugins.get("plugin.{last}")
+first = time.perf_counter()
+for _ in range(1000):
+    Plugins.get("plugin.{last}")
+cached = time.perf_counter()
+json.dump({{
+    "register": registered - started,
+    "first_get": first - registered,
+    "cached_get": (cached - first) / 1000,
+    "modules": sum(name.startswith("bench_plugins.") for name in sys.modules),
+}}, sys.stdout)
+"""
+
+
+def generate(directory: str, modules: int):
+    package = join(directory, "bench_plugins")
+    makedirs(package)
+    open(join(package, "__init__.py"), "w").close()
+    for number in range(modules):
+        with open(join(package, f"plugin_{number}.py"), "w") as handle:
+            handle.write(PLUGIN.format(number=number))
+
+
+def run(directory: str, modules: int, lazy: bool) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-B", "-c", RUNNER.format(modules=modules, lazy=lazy, last=modules - 1)],
+        cwd=directory, check=True, capture_output=True, text=True,
+        env={"PYTHONPATH": ":".join([directory] + sys.path[1:])},
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modules", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    directory = mkdtemp()
+    generate(directory, args.modules)
+
+    print(f"{args.modules} plugin modules, best of {args.runs} runs")
+    for label, lazy in (("eager", False), ("lazy", True)):
+        results = [run(directory, args.modules, lazy) for _ in range(args.runs)]
+        best = {name: min(result[name] for result in results) for name in ("register", "first_get", "cached_get")}
+        print(
+            f"  {label:<6} register {best['register'] * 1e3:>8.1f} ms, "
+            f"first get {best['first_get'] * 1e6:>8.1f} us, "
+            f"cached get {best['cached_get'] * 1e6:>6.1f} us, "
+            f"{results[0]['modules']} plugin modules imported"
+        )
+
+
+if __name__ == "__main__":
+    main()
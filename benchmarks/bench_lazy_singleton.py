@@ -0,0 +1,85 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Import time & first use of a module-level singleton: eager, lazy & lazy with warm-up.
+
+Each mode imports a generated module (whose singleton builds a large index)
+in a fresh interpreter, does `--work` seconds of other start-up work, then uses it.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_lazy_singleton.py --entries 1000000 --work 0.5
+"""
+
+import json
+import subprocess
+import sys
+from argparse import ArgumentParser
+from os.path import join
+from tempfile import mkdtemp
+
+MODULE = """
+from customlib.singletons import MetaSingleton
+
+
+class Index(object, metaclass=MetaSingleton, lazy={lazy}, warm_up={warm_up}):
+
+    def __init__(self):
+        self.entries = {{str(number): number for number in range({entries})}}
+
+    def lookup(self, key):
+        return self.entries[key]
+
+
+INDEX = Index()
+"""
+
+RUNNER = """
+import json, sys, time
+
+started = time.perf_counter()
+import bench_index
+imported = time.perf_counter()
+time.sleep({work})
+used = time.perf_counter()
+bench_index.INDEX.lookup("1")
+finished = time.perf_counter()
+json.dump({{"import": imported - started, "first_use": finished - used}}, sys.stdout)
+"""
+
+MODES = (
+    ("eager", False, False),
+    ("lazy", True, False),
+    ("lazy + warm_up", True, True),
+)
+
+
+def run(directory: str, lazy: bool, warm_up: bool, entries: int, work: float) -> dict:
+    with open(join(directory, "bench_index.py"), "w") as handle:
+        handle.write(MODULE.format(lazy=lazy, warm_up=warm_up, entries=entries))
+
+    output = subprocess.run(
+        [sys.executable, "-B", "-c", RUNNER.format(work=work)],
+        cwd=directory, check=True, capture_output=True, text=True,
+        env={"PYTHONPATH": ":".join([directory] + sys.path[1:])},
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1000000)
+    parser.add_argument("--work", type=float, default=0.5)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    directory = mkdtemp()
+    print(f"{args.entries} entries, {args.work}s of other start-up work, best of {args.runs} runs")
+    for label, lazy, warm_up in MODES:
+        results = [run(directory, lazy, warm_up, args.entries, args.work) for _ in range(args.runs)]
+        imported = min(result["import"] for result in results)
+        first_use = min(result["first_use"] for result in results)
+        print(f"  {label:<16} import {imported * 1e3:>8.1f} ms, first use {first_use * 1e3:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Overhead of the lock & fsync instrumentation hooks, disabled and enabled.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_metrics.py --loops 20000 --repeat 9
+"""
+
+from argparse import ArgumentParser
+from os.path import join
+from tempfile import mkdtemp
+from timeit import repeat
+
+from customlib.filehandlers import FileHandler
+from customlib.filelockers import LOCK, MemorySink, core, metrics
+
+
+def best(statement, loops: int, runs: int) -> float:
+    """Return the best time (in microseconds) of one call of `statement`."""
+    return min(repeat(statement, number=loops, repeat=runs)) / loops * 1e6
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--loops", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=9)
+    args = parser.parse_args()
+
+    path = join(mkdtemp(), "bench_metrics.txt")
+    with open(path, "w") as handle:
+        handle.write("data")
+
+    handle = open(path, "r")
+
+    def raw_lock():
+        core._lock(handle, LOCK.SH)
+        core._unlock(handle)
+
+    def hooked_lock():
+        core.lock(handle, LOCK.SH)
+        core.unlock(handle)
+
+    def with_block():
+        with FileHandler(path, "r") as fh:
+            fh.read()
+
+    cases = (
+        ("core lock+unlock", hooked_lock, args.loops),
+        ("FileHandler('r') with-block", with_block, args.loops // 10),
+    )
+
+    print(f"best of {args.repeat} runs, microseconds per call")
+    print(f"  {'platform lock+unlock (no hooks)':<32} {best(raw_lock, args.loops, args.repeat):>8.2f}")
+    for label, statement, loops in cases:
+        metrics.disable()
+        disabled = best(statement, loops, args.repeat)
+        metrics.enable(MemorySink())
+        enabled = best(statement, loops, args.repeat)
+        metrics.disable()
+        print(f"  {label:<32} {disabled:>8.2f} disabled, {enabled:>8.2f} enabled")
+
+    handle.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# -*- coding: UTF-8 -*-
+
+"""
+N workers updating disjoint regions of one file: whole-file `flock` against byte-range (OFD) locks.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_range_locks.py --workers 1 4 8 16 --updates 500
+"""
+
+from argparse import ArgumentParser
+from multiprocessing import Process, Barrier as ProcessBarrier
+from os import pwrite
+from os.path import join
+from tempfile import mkdtemp
+from threading import Thread, Barrier
+from time import perf_counter, sleep
+
+from customlib.filelockers import FileLocker, LOCK
+
+REGION = 1 << 16
+
+
+def worker(path: str, index: int, updates: int, ranged: bool, work: float, barrier):
+    locker = FileLocker()
+    data = bytes([index % 256]) * REGION
+
+    with open(path, "r+b", buffering=0) as handle:
+        barrier.wait()
+        for _ in range(updates):
+            if ranged is True:
+                locker.acquire(handle, LOCK.EX, offset=index * REGION, length=REGION)
+            else:
+                locker.acquire(handle, LOCK.EX)
+            try:
+                pwrite(handle.fileno(), data, index * REGION)
+                # simulated work while the region is locked
+                sleep(work)
+            finally:
+                if ranged is True:
+                    locker.release(handle, offset=index * REGION, length=REGION)
+                else:
+                    locker.release(handle)
+
+
+def run(path: str, workers: int, updates: int, ranged: bool, work: float, processes: bool) -> float:
+    """Return the updates/sec of `workers` threads (or processes)."""
+    barrier = (ProcessBarrier if processes is True else Barrier)(workers + 1)
+    kind = Process if processes is True else Thread
+
+    running = [
+        kind(target=worker, args=(path, index, updates, ranged, work, barrier))
+        for index in range(workers)
+    ]
+    for item in running:
+        item.start()
+
+    barrier.wait()
+    started = perf_counter()
+    for item in running:
+        item.join()
+    return workers * updates / (perf_counter() - started)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--work", type=float, default=0.0002, help="seconds spent holding each lock")
+    args = parser.parse_args()
+
+    path = join(mkdtemp(), "bench_range_locks.bin")
+    with open(path, "wb") as handle:
+        handle.truncate(max(args.workers) * REGION)
+
+    print(f"{args.updates} updates of a {REGION // 1024} KiB region per worker, {args.work * 1e6:.0f} us locked")
+    print(f"  {'workers':<8} {'threads flock / range':>30} {'processes flock / range':>30}")
+    for workers in args.workers:
+        rates = [
+            run(path, workers, args.updates, ranged, args.work, processes)
+            for processes in (False, True) for ranged in (False, True)
+        ]
+        print(f"  {workers:<8} {rates[0]:>14.0f} / {rates[1]:<14.0f}{rates[2]:>15.0f} / {rates[3]:.0f} updates/sec")
+
+
+if __name__ == "__main__":
+    main()
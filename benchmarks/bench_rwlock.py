@@ -0,0 +1,71 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Reads/sec of N reader threads sharing a file with one writer thread, per in-process lock policy.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_rwlock.py --readers 8 --reads 150
+"""
+
+from argparse import ArgumentParser
+from os.path import join
+from tempfile import mkdtemp
+from threading import Barrier, Event, Thread
+from time import perf_counter
+
+from customlib.filehandlers import FileHandler
+from customlib.filehandlers.locks import ReadWriteLock
+
+
+def run(path: str, policy: str, readers: int, reads: int) -> tuple:
+    """Return the reads/sec & the number of writes done meanwhile."""
+    with FileHandler(path, "w", encoding="UTF-8", lock_policy=policy) as handle:
+        handle.write("line\n" * 1000)
+
+    barrier, stopped, writes = Barrier(readers + 2), Event(), [0]
+
+    def reader():
+        barrier.wait()
+        for _ in range(reads):
+            with FileHandler(path, "r", encoding="UTF-8", lock_policy=policy) as handle:
+                handle.read()
+
+    def writer():
+        barrier.wait()
+        while not stopped.is_set():
+            with FileHandler(path, "a", encoding="UTF-8", lock_policy=policy) as handle:
+                handle.write("line\n")
+            writes[0] += 1
+
+    threads = [Thread(target=reader) for _ in range(readers)]
+    background = Thread(target=writer)
+    for thread in threads + [background]:
+        thread.start()
+
+    barrier.wait()
+    started = perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - started
+
+    stopped.set()
+    background.join()
+    return readers * reads / elapsed, writes[0]
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--reads", type=int, default=150)
+    args = parser.parse_args()
+
+    path = join(mkdtemp(), "bench_rwlock.txt")
+
+    print(f"{args.readers} readers x {args.reads} reads, 1 appending writer")
+    for policy in ReadWriteLock.__policies__:
+        rate, writes = run(path, policy, args.readers, args.reads)
+        print(f"  {policy:<8} {rate:>10.0f} reads/sec  ({writes} writes meanwhile)")
+
+
+if __name__ == "__main__":
+    main()
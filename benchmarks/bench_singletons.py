@@ -0,0 +1,93 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Hot path (instance already built) of `MetaSingleton` & `singleton` vs the former unguarded check-then-insert.
+
+The variants are timed in interleaved rounds and the best round of each is reported,
+so a noisy machine affects them all alike.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_singletons.py --loops 1000000 --rounds 15
+"""
+
+from argparse import ArgumentParser
+from functools import wraps
+from timeit import Timer
+from weakref import WeakValueDictionary
+
+from customlib.singletons import MetaSingleton, singleton
+
+# the former implementations (no lock, `hasattr` & `in` + `[]` checks)
+_INSTANCES = WeakValueDictionary()
+
+
+class BaselineMetaSingleton(type):
+
+    def __call__(cls, *args, **kwargs):
+        if not hasattr(cls, "_instance"):
+            cls._instance = super(BaselineMetaSingleton, cls).__call__(*args, **kwargs)
+        return cls._instance
+
+
+def baseline_singleton(cls):
+
+    @wraps(cls)
+    def wrapper(*args, **kwargs):
+        if cls not in _INSTANCES:
+            instance = cls(*args, **kwargs)
+            _INSTANCES[cls] = instance
+        return _INSTANCES[cls]
+    return wrapper
+
+
+class BaselineMeta(object, metaclass=BaselineMetaSingleton):
+    pass
+
+
+class CurrentMeta(object, metaclass=MetaSingleton):
+    pass
+
+
+class _Decorated(object):
+    pass
+
+
+class _BaselineDecorated(object):
+    pass
+
+
+CurrentDecorated = singleton(_Decorated)
+BaselineDecorated = baseline_singleton(_BaselineDecorated)
+
+CASES = (
+    ("MetaSingleton", "before", BaselineMeta),
+    ("MetaSingleton", "after", CurrentMeta),
+    ("singleton", "before", BaselineDecorated),
+    ("singleton", "after", CurrentDecorated),
+)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--loops", type=int, default=1000000)
+    parser.add_argument("--rounds", type=int, default=15)
+    args = parser.parse_args()
+
+    # keep the instances alive (`singleton` only references them weakly) & off the hot path
+    instances = [factory() for _, _, factory in CASES]
+    timers = [Timer(factory) for _, _, factory in CASES]
+    best = [float("inf")] * len(CASES)
+
+    for _ in range(args.rounds):
+        for index, timer in enumerate(timers):
+            best[index] = min(best[index], timer.timeit(args.loops) / args.loops)
+
+    print(f"best of {args.rounds} interleaved rounds of {args.loops} calls, nanoseconds per call")
+    for (name, label, factory), seconds in zip(CASES, best):
+        print(f"  {name:<14} {label:<7} {seconds * 1e9:>8.1f}")
+
+    assert all(factory() is instance for (_, _, factory), instance in zip(CASES, instances))
+
+
+if __name__ == "__main__":
+    main()
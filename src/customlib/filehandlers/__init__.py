@@ -1,5 +1,20 @@
 # -*- coding: UTF-8 -*-
 
-from .handlers import AbstractFileHandler, FileHandler
+from .handlers import AbstractFileHandler, FileHandler, AsyncFileHandler, MappedFileHandler, AtomicFileHandler
+from .locks import ReadWriteLock
+from .named import NamedLockManager
+from .pools import HandlePool
+from .writers import AppendWriter, RotatingShardWriter
 
-__all__ = ["AbstractFileHandler", "FileHandler"]
+__all__ = [
+    "AbstractFileHandler",
+    "FileHandler",
+    "AsyncFileHandler",
+    "MappedFileHandler",
+    "AtomicFileHandler",
+    "HandlePool",
+    "ReadWriteLock",
+    "NamedLockManager",
+    "AppendWriter",
+    "RotatingShardWriter",
+]
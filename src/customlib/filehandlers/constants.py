@@ -1,5 +1,14 @@
 # -*- coding: UTF-8 -*-
 
-from weakref import WeakValueDictionary
+from .locks import LockTable
+from .. import forks
 
-FILE_LOCKS = WeakValueDictionary()
+# default size of the chunks moved by `copy_to` & `send_to`
+CHUNK_SIZE = 1 << 22
+
+FILE_LOCKS = LockTable()
+COMMITTERS = LockTable()
+
+# reset in forked children (see `customlib.forks.enable`)
+forks.register(FILE_LOCKS, table=True)
+forks.register(COMMITTERS, table=True)
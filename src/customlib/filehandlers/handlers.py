@@ -1,20 +1,44 @@
 # -*- coding: UTF-8 -*-
 
 from abc import ABC, abstractmethod
-from os import fsync
-from typing import IO, AnyStr, List, TextIO, BinaryIO, Union, Optional, Any
-
-from .constants import FILE_LOCKS
-from .utils import dispatch_lock
-from ..filelockers import FileLocker
+from asyncio import Lock as AsyncLock, get_running_loop, sleep
+from concurrent.futures import Executor
+from functools import partial
+from mmap import mmap, ACCESS_READ
+from os import SEEK_CUR, chmod, close, fsync, fstat, lseek, remove, replace, stat
+from os.path import abspath, dirname, exists
+from stat import S_IMODE
+from socket import socket
+from threading import RLock, get_ident
+from time import perf_counter
+from typing import IO, AnyStr, List, TextIO, BinaryIO, Union, Optional, Any, Callable, Iterator
+
+from .constants import CHUNK_SIZE, FILE_LOCKS, COMMITTERS
+from .locks import LockView
+from .pools import HandlePool, evict_idle
+from .utils import (
+    acquire_measured, copy_range, send_range, dispatch_lock, dispatch_committer, fsync_measured,
+    get_mode, make_temp, sync_directory
+)
+from ..filelockers import FileLocker, LOCK, metrics
 
 
 class AbstractFileHandler(ABC):
-    """Base abstract handler for all context-manager classes in this module."""
+    """
+    Base abstract handler for all context-manager classes in this module.
+
+    Handlers opened on the same file share an in-process lock that follows
+    the file locking rules: read (`"r"`) handlers share it, the others hold it
+    exclusively. Like the file lock, it is held for as long as a handle is open.
+    """
 
-    def __init__(self, file: str, *args, **kwargs):
+    def __init__(self, file: str, *args, lock_policy: str = "writers", **kwargs):
         self._file, self._args, self._kwargs = file, args, kwargs
-        self._thread_lock = dispatch_lock(self._file, FILE_LOCKS)
+        self._handle_lock = RLock()
+
+        # same rule as `FileLocker.__flags__`: only "r" handles are locked with `LOCK.SH`
+        self._lock_policy, self._lock_shared = lock_policy, get_mode(*args, **kwargs) == "r"
+        self._thread_lock = self._dispatch_lock()
 
     @property
     def mode(self) -> str:
@@ -97,27 +121,112 @@ class AbstractFileHandler(ABC):
         self._handle.writelines(lines)
 
     def close(self):
-        with self._thread_lock:
+        with self._handle_lock:
             if hasattr(self, "_handle"):
                 self.release(self._handle)
                 del self._handle
+        self.commit()
 
     def __enter__(self) -> Union[IO, BinaryIO, TextIO]:
-        self._thread_lock.acquire()
+        self._handle_lock.acquire()
         try:
             if not hasattr(self, "_handle"):
                 self._handle = self.acquire(self._file, *self._args, **self._kwargs)
-        except FileNotFoundError:
-            self._thread_lock.release()
+        except Exception:
+            self._handle_lock.release()
             raise
         else:
             return self._handle
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if hasattr(self, "_handle"):
-            self.release(self._handle)
-            del self._handle
-        self._thread_lock.release()
+        try:
+            if hasattr(self, "_handle"):
+                self.release(self._handle)
+                del self._handle
+        finally:
+            self._handle_lock.release()
+        self.commit()
+
+    def commit(self):
+        """Called after the handle lock is released (nothing to do by default)."""
+
+    def copy_to(
+            self,
+            target: Union[str, "AbstractFileHandler"],
+            offset: int = 0,
+            count: int = None,
+            chunk_size: int = CHUNK_SIZE,
+            progress: Callable[[int, int], Any] = None,
+    ) -> int:
+        """
+        Copy `count` bytes of the file (up to its end by default), starting at `offset`,
+        to `target`, in kernel space where the platform allows it (`copy_file_range`
+        or `sendfile`) and in `chunk_size` chunks through a buffer otherwise.
+
+        The file keeps its own lock during the copy (`LOCK.SH` for `"r"` handlers).
+        `target` is either an open handler, written at its current position,
+        or a path, truncated & written under `LOCK.EX` through a `FileHandler`.
+
+        :param progress: Called with the number of bytes copied so far and the total.
+        :return: The number of bytes copied.
+        """
+        if isinstance(target, AbstractFileHandler):
+            with target._handle_lock:
+                func = partial(self._copy_to, target._handle)
+                return self._transfer(func, offset, count, chunk_size, progress)
+
+        with FileHandler(target, "wb") as handle:
+            func = partial(self._copy_to, handle)
+            return self._transfer(func, offset, count, chunk_size, progress)
+
+    def send_to(
+            self,
+            sock: socket,
+            offset: int = 0,
+            count: int = None,
+            chunk_size: int = CHUNK_SIZE,
+            progress: Callable[[int, int], Any] = None,
+    ) -> int:
+        """
+        Send `count` bytes of the file (up to its end by default), starting at `offset`,
+        through the blocking socket `sock`, with `sendfile` where the platform allows it
+        and in `chunk_size` chunks through a buffer otherwise.
+
+        The file keeps its own lock during the transfer (`LOCK.SH` for `"r"` handlers).
+
+        :param progress: Called with the number of bytes sent so far and the total.
+        :return: The number of bytes sent.
+        """
+        return self._transfer(partial(send_range, sock), offset, count, chunk_size, progress)
+
+    def _transfer(self, func: Callable, *args) -> int:
+        """Call `func` with the file descriptor of the handle, opening it for the call if needed."""
+        with self._handle_lock:
+            if hasattr(self, "_handle"):
+                self._handle.flush()
+                return func(self._handle.fileno(), *args)
+
+            with self as handle:
+                return func(handle.fileno(), *args)
+
+    @staticmethod
+    def _copy_to(handle: IO, src: int, *args) -> int:
+        handle.flush()
+        dst = handle.fileno()
+        try:
+            return copy_range(src, dst, *args)
+        finally:
+            # the data was written behind the buffers' back
+            handle.seek(lseek(dst, 0, SEEK_CUR))
+
+    def _dispatch_lock(self) -> LockView:
+        """
+        Return the in-process lock of the file in the mode used by this handler.
+        Files are identified by device & inode, so it must be looked up again
+        whenever the file might have been created or replaced in the meantime.
+        """
+        lock = dispatch_lock(self._file, FILE_LOCKS, self._lock_policy)
+        return lock.shared if self._lock_shared is True else lock.exclusive
 
     @abstractmethod
     def acquire(self, *args, **kwargs) -> Union[IO, BinaryIO, TextIO]:
@@ -129,39 +238,481 @@ class AbstractFileHandler(ABC):
 
 
 class FileHandler(AbstractFileHandler):
-    """Simple handler with thread & file lock management."""
+    """
+    Simple handler with thread & file lock management.
+
+    With `group_commit` enabled, writers released on the same file share
+    their `fsync` calls: the data is flushed and the lock released right away,
+    then each writer blocks until a batched `fsync` made its data durable.
+
+    With a `pool`, the locked handles are kept open between `with` blocks
+    and reused by the next block opening the same file with the same arguments.
+    """
+
+    def __init__(
+            self,
+            *args,
+            group_commit: bool = False,
+            commit_delay: float = 0.0,
+            commit_batch: int = 64,
+            pool: HandlePool = None,
+            **kwargs
+    ):
+        if (group_commit is True) and (pool is not None):
+            raise ValueError("Group commit cannot be used with pooled handles!")
 
-    def __init__(self, *args, **kwargs):
         super(FileHandler, self).__init__(*args, **kwargs)
 
         self._file_lock = FileLocker()
+        # acquisition time of the in-process lock, while instrumented
+        self._held_since: Optional[float] = None
+
+        self._group_commit = group_commit
+        self._commit_delay, self._commit_batch = commit_delay, commit_batch
+        self._uncommitted = {}
+        self._pool = pool
+
+        with self._handle_lock:
+            if not hasattr(self, "_handle"):
+                self._handle = self.acquire(self._file, *self._args, **self._kwargs)
+
+    def acquire(self, *args, **kwargs) -> Union[IO, BinaryIO, TextIO]:
+        """Returns a new locked file handle."""
+        self._thread_lock = self._dispatch_lock()
+
+        sink = metrics.SINK
+        if sink is None:
+            self._thread_lock.acquire()
+        else:
+            self._held_since = acquire_measured(self._thread_lock, metrics.key(self._file), sink)
 
-        self._thread_lock.acquire()
+        try:
+            evict_idle(self._file, keep=self._pool)
+            if self._pool is not None:
+                # built under the lock, the file might have been replaced since the last block
+                self._pool_key = self._pool.key(self._file, *self._args, **self._kwargs)
+                handle = self._pool.get(self._pool_key)
+                if handle is not None:
+                    return handle
+            handle = open(*args, **kwargs)
+            return self._file_lock.acquire(handle)
+        except BaseException:
+            self._thread_lock.release()
+            self._release_measured()
+            raise
+
+    def release(self, handle: Union[IO, BinaryIO, TextIO]):
+        """Close the file handle and release the resources."""
+        try:
+            handle.flush()
+            if "r" not in handle.mode:
+                if self._group_commit is True:
+                    # the handle is closed by `commit` once its data is durable
+                    self._file_lock.release(handle)
+                    self._uncommitted.setdefault(get_ident(), []).append(handle)
+                    return
+                sink = metrics.SINK
+                if sink is None:
+                    fsync(handle.fileno())
+                else:
+                    fsync_measured(handle.fileno(), metrics.key(self._file), sink)
+            if (self._pool is not None) and self._pool.put(self._pool_key, handle):
+                return
+            self._file_lock.release(handle)
+            handle.close()
+        finally:
+            self._thread_lock.release()
+            self._release_measured()
+
+    def _release_measured(self):
+        """Record how long the in-process lock was held (if the acquisition was instrumented)."""
+        if self._held_since is not None:
+            sink = metrics.SINK
+            if sink is not None:
+                sink.observe(metrics.key(self._file), "thread_lock.hold", perf_counter() - self._held_since)
+            self._held_since = None
+
+    def commit(self):
+        """Block until the data written through the handles released by this thread is durable."""
+        for handle in self._uncommitted.pop(get_ident(), []):
+            try:
+                committer = dispatch_committer(handle, COMMITTERS)
+                committer.commit(handle.fileno(), self._commit_delay, self._commit_batch)
+            finally:
+                handle.close()
+
+
+class AsyncFileHandler(AbstractFileHandler):
+    """
+    File handler for `asyncio` with thread & file lock management.
+
+    It follows the same locking rules as `FileHandler`, but it waits for the
+    locks by polling them (backing off exponentially from `poll_delay` up to
+    `max_poll_delay` seconds; the in-process lock through a queued request, so its
+    policy applies as for blocking waiters) and runs the blocking calls
+    (`open`, `read`, `write`, `fsync`...) in `executor` (the loop's default
+    executor if not provided), so the event loop is never blocked.
+
+    Example:
+        async with AsyncFileHandler("test_file.txt", "a", encoding="UTF-8") as fh:
+            await fh.write("Just testing out this cool new filehandler.\\n")
+    """
+
+    def __init__(
+            self,
+            *args,
+            executor: Executor = None,
+            poll_delay: float = 0.001,
+            max_poll_delay: float = 0.05,
+            **kwargs
+    ):
+        super(AsyncFileHandler, self).__init__(*args, **kwargs)
+
+        self._file_lock = FileLocker()
+        self._executor = executor
+        self._poll_delay, self._max_poll_delay = poll_delay, max_poll_delay
+        self._task_lock: Optional[AsyncLock] = None
+
+    async def __aenter__(self) -> "AsyncFileHandler":
+        # created here, so it is bound to the running loop
+        if self._task_lock is None:
+            self._task_lock = AsyncLock()
+
+        await self._task_lock.acquire()
         try:
             if not hasattr(self, "_handle"):
-                self._handle = self.acquire(*args, **kwargs)
-        except FileNotFoundError:
+                self._handle = await self.acquire_async(self._file, *self._args, **self._kwargs)
+        except BaseException:
+            self._task_lock.release()
             raise
+        else:
+            return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if hasattr(self, "_handle"):
+                await self.release_async(self._handle)
+                del self._handle
+        finally:
+            self._task_lock.release()
+
+    async def aclose(self):
+        if hasattr(self, "_handle"):
+            handle = self._handle
+            del self._handle
+            await self.release_async(handle)
+
+    async def flush(self):
+        await self._run(self._handle.flush)
+
+    async def read(self, n: int = -1) -> AnyStr:
+        return await self._run(self._handle.read, n)
+
+    async def readline(self, limit: int = -1) -> AnyStr:
+        return await self._run(self._handle.readline, limit)
+
+    async def readlines(self, hint: int = -1) -> List[AnyStr]:
+        return await self._run(self._handle.readlines, hint)
+
+    async def truncate(self, size: int = None) -> int:
+        return await self._run(self._handle.truncate, size)
+
+    async def write(self, string: AnyStr) -> int:
+        return await self._run(self._handle.write, string)
+
+    async def writelines(self, lines: List[AnyStr]) -> None:
+        await self._run(self._handle.writelines, lines)
+
+    async def acquire_async(self, *args, **kwargs) -> Union[IO, BinaryIO, TextIO]:
+        """Returns a new locked file handle without blocking the event loop."""
+        self._thread_lock = self._dispatch_lock()
+
+        await self._acquire_thread_lock()
+
+        try:
+            evict_idle(self._file)
+            handle = await self._run(open, *args, **kwargs)
+            try:
+                return await self._file_lock.acquire_async(
+                    handle, delay=self._poll_delay, max_delay=self._max_poll_delay
+                )
+            except BaseException:
+                handle.close()
+                raise
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    async def _acquire_thread_lock(self):
+        """
+        Queue for the in-process lock and poll the request, so it counts as a waiter
+        for the lock's policy (a waiting writer holds back new readers) like a blocking one.
+        """
+        ticket = self._thread_lock.enqueue()
+        if ticket is None:
+            return
+
+        delay = self._poll_delay
+        try:
+            while not self._thread_lock.poll(ticket):
+                await sleep(delay)
+                delay = min(delay * 2, self._max_poll_delay)
+        except BaseException:
+            # cancelled while waiting: withdraw the request, unless it was just granted
+            if self._thread_lock.poll(ticket):
+                self._thread_lock.release()
+            else:
+                self._thread_lock.cancel(ticket)
+            raise
+
+    async def release_async(self, handle: Union[IO, BinaryIO, TextIO]):
+        """Close the file handle and release the resources without blocking the event loop."""
+        try:
+            await self._run(handle.flush)
+            if "r" not in handle.mode:
+                await self._run(fsync, handle.fileno())
+            self._file_lock.release(handle)
+            handle.close()
         finally:
             self._thread_lock.release()
 
     def acquire(self, *args, **kwargs) -> Union[IO, BinaryIO, TextIO]:
-        """Returns a new locked file handle."""
+        """Returns a new locked file handle (blocking, for use outside the event loop)."""
+        self._thread_lock = self._dispatch_lock()
         self._thread_lock.acquire()
         try:
+            evict_idle(self._file)
             handle = open(*args, **kwargs)
-        except FileNotFoundError:
-            raise
-        else:
             return self._file_lock.acquire(handle)
-        finally:
+        except BaseException:
             self._thread_lock.release()
+            raise
 
     def release(self, handle: Union[IO, BinaryIO, TextIO]):
-        """Close the file handle and release the resources."""
-        with self._thread_lock:
+        """Close the file handle and release the resources (blocking, for use outside the event loop)."""
+        try:
             handle.flush()
             if "r" not in handle.mode:
                 fsync(handle.fileno())
             self._file_lock.release(handle)
             handle.close()
+        finally:
+            self._thread_lock.release()
+
+    async def _run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run the blocking `func` in the executor."""
+        loop = get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+
+class MappedFileHandler(AbstractFileHandler):
+    """
+    Read-only handler exposing the file content through a memory map.
+
+    The file is locked in shared mode (`LOCK.SH`) for as long as the map is open,
+    and slicing, `find` and line iteration return `memoryview` objects over
+    the mapped pages, so the content is never copied into Python objects.
+    The views returned by slicing must be released before closing the handler.
+
+    Example:
+        with MappedFileHandler("test_file.txt") as view:
+            offset = view.find(b"needle")
+            for line in view:
+                ...
+    """
+
+    def __init__(self, file: str, **kwargs):
+        super(MappedFileHandler, self).__init__(file, "rb", **kwargs)
+
+        self._file_lock = FileLocker()
+
+        with self._handle_lock:
+            if not hasattr(self, "_handle"):
+                self._handle = self.acquire(self._file, *self._args, **self._kwargs)
+
+    def __enter__(self) -> "MappedFileHandler":
+        super(MappedFileHandler, self).__enter__()
+        return self
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[int, memoryview]:
+        return self._view[item]
+
+    def __iter__(self) -> Iterator[memoryview]:
+        return self.lines()
+
+    @property
+    def view(self) -> memoryview:
+        """A read-only `memoryview` over the whole file."""
+        return self._view
+
+    def find(self, sub: bytes, start: int = 0, end: int = None) -> int:
+        """Return the lowest offset where `sub` is found within [start:end], -1 if not found."""
+        if self._map is None:
+            return -1
+        return self._map.find(sub, start, len(self._map) if end is None else end)
+
+    def rfind(self, sub: bytes, start: int = 0, end: int = None) -> int:
+        """Return the highest offset where `sub` is found within [start:end], -1 if not found."""
+        if self._map is None:
+            return -1
+        return self._map.rfind(sub, start, len(self._map) if end is None else end)
+
+    def lines(self, start: int = 0, end: int = None) -> Iterator[memoryview]:
+        """
+        Iterate over the lines (including the line ending) within [start:end].
+        Each line is released once the next one is produced (use `bytes(line)` to keep it).
+        """
+        if end is None:
+            end = len(self._view)
+
+        while start < end:
+            stop = self.find(b"\n", start, end)
+            stop = end if stop == -1 else stop + 1
+
+            line = self._view[start:stop]
+            try:
+                yield line
+            finally:
+                line.release()
+
+            start = stop
+
+    def acquire(self, *args, **kwargs) -> BinaryIO:
+        """Returns a new locked & mapped file handle."""
+        self._thread_lock = self._dispatch_lock()
+        self._thread_lock.acquire()
+        try:
+            evict_idle(self._file)
+            handle = self._file_lock.acquire(open(*args, **kwargs), LOCK.SH)
+            try:
+                if fstat(handle.fileno()).st_size > 0:
+                    self._map = mmap(handle.fileno(), 0, access=ACCESS_READ)
+                    self._view = memoryview(self._map)
+                else:
+                    # empty files cannot be mapped
+                    self._map, self._view = None, memoryview(b"")
+            except BaseException:
+                self._file_lock.release(handle)
+                handle.close()
+                raise
+            return handle
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def release(self, handle: BinaryIO):
+        """Unmap & close the file handle and release the resources."""
+        self._view.release()
+        if self._map is not None:
+            # raises `BufferError` (keeping the lock) while views are still exported
+            self._map.close()
+
+        try:
+            self._file_lock.release(handle)
+            handle.close()
+        finally:
+            self._thread_lock.release()
+
+
+class AtomicFileHandler(AbstractFileHandler):
+    """
+    Handler rewriting the file atomically, without ever blocking its readers.
+
+    The data is written to a temporary file in the same directory which, on
+    release, is synced and moved over the target with `os.replace` (the
+    directory is synced as well). Readers keep reading the old version in the
+    meantime, while concurrent replacers are serialized through an exclusive
+    lock on the `<file>.lock` sidecar file.
+    If the `with` block raises, the temporary file is discarded and the target is left untouched.
+
+    Example:
+        with AtomicFileHandler("test_file.txt", "w", encoding="UTF-8") as fh:
+            fh.write("Just testing out this cool new filehandler.\\n")
+    """
+
+    def __init__(self, file: str, mode: str = "w", *args, **kwargs):
+        if get_mode(mode) != "w":
+            raise ValueError(f"Invalid mode for an atomic rewrite: '{mode}'!")
+
+        # needed by `_dispatch_lock`
+        self._lock_file = f"{file}.lock"
+
+        super(AtomicFileHandler, self).__init__(file, mode, *args, **kwargs)
+
+        self._file_lock = FileLocker()
+        self._discard = False
+
+        with self._handle_lock:
+            if not hasattr(self, "_handle"):
+                self._handle = self.acquire(self._file, *self._args, **self._kwargs)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._discard = exc_type is not None
+        super(AtomicFileHandler, self).__exit__(exc_type, exc_val, exc_tb)
+
+    def acquire(self, file: str, *args, **kwargs) -> Union[IO, BinaryIO, TextIO]:
+        """Returns a new handle to a temporary file, with the sidecar lock acquired."""
+        self._thread_lock = self._dispatch_lock()
+        self._thread_lock.acquire()
+        try:
+            self._lock_handle = self._file_lock.acquire(open(self._lock_file, "a"), LOCK.EX)
+            try:
+                fd, self._temp = make_temp(file)
+                try:
+                    return open(fd, *args, **kwargs)
+                except BaseException:
+                    close(fd)
+                    remove(self._temp)
+                    raise
+            except BaseException:
+                self._release_lock_file()
+                raise
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def release(self, handle: Union[IO, BinaryIO, TextIO]):
+        """Replace the file with the temporary one and release the resources."""
+        try:
+            try:
+                handle.flush()
+                fsync(handle.fileno())
+                handle.close()
+
+                if self._discard is True:
+                    remove(self._temp)
+                else:
+                    self._replace(self._temp, self._file)
+            except BaseException:
+                if exists(self._temp):
+                    remove(self._temp)
+                raise
+            finally:
+                self._discard = False
+                self._release_lock_file()
+        finally:
+            self._thread_lock.release()
+
+    def _dispatch_lock(self) -> LockView:
+        """Replacers are serialized on the sidecar file, so readers of the target are never blocked."""
+        return dispatch_lock(self._lock_file, FILE_LOCKS, self._lock_policy).exclusive
+
+    def _release_lock_file(self):
+        try:
+            self._file_lock.release(self._lock_handle)
+        finally:
+            self._lock_handle.close()
+
+    @staticmethod
+    def _replace(source: str, target: str):
+        """Move `source` over `target` keeping the target's permissions."""
+        try:
+            chmod(source, S_IMODE(stat(target).st_mode))
+        except FileNotFoundError:
+            pass
+
+        replace(source, target)
+        sync_directory(dirname(abspath(target)))
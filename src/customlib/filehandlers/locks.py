@@ -0,0 +1,277 @@
+# -*- coding: UTF-8 -*-
+
+from collections import deque
+from itertools import count
+from threading import Lock, Condition, get_ident
+from time import monotonic
+from typing import Any, Callable, Hashable, Optional
+from weakref import WeakValueDictionary
+
+
+class ReadWriteLock(object):
+    """
+    Shared/exclusive lock for the threads of this process
+    (the in-process counterpart of `LOCK.SH` & `LOCK.EX`).
+
+    Like `flock`, the lock is not owned by a thread, so it can be released
+    by a thread other than the one that acquired it. The exclusive mode is not
+    reentrant, but a thread already holding the shared mode may always take it
+    again (whatever the policy), so nested readers cannot deadlock behind a
+    waiting writer.
+
+    Policies:
+        - ``writers``: waiting writers block new readers (default);
+        - ``readers``: readers may join as long as no writer holds the lock;
+        - ``fair``: waiters are served in arrival order, consecutive readers together.
+    """
+
+    __policies__: tuple = ("writers", "readers", "fair")
+
+    def __init__(self, policy: str = "writers"):
+        if policy not in self.__policies__:
+            raise ValueError(f"Unknown lock policy '{policy}'!")
+
+        self._policy = policy
+        self._condition = Condition(Lock())
+        self._tickets = count()
+        self._waiting = deque()
+        self._waiting_writers: int = 0
+        self._readers: int = 0
+        # shared holds by thread (readers of a thread may enter again)
+        self._owners: dict = {}
+        self._writer: bool = False
+
+    @property
+    def policy(self) -> str:
+        return self._policy
+
+    @property
+    def shared(self) -> "LockView":
+        """The shared (read) mode of this lock."""
+        return LockView(self, True)
+
+    @property
+    def exclusive(self) -> "LockView":
+        """The exclusive (write) mode of this lock."""
+        return LockView(self, False)
+
+    def acquire(self, shared: bool = False, blocking: bool = True, timeout: float = -1) -> bool:
+        """
+        Acquire the lock in shared or exclusive mode.
+
+        :param shared: Acquire a shared (read) lock instead of an exclusive one.
+        :param blocking: Wait for the lock if it cannot be acquired right away.
+        :param timeout: The maximum time (in seconds) to wait for, `-1` waits forever.
+        :return: `True` if the lock was acquired, `False` otherwise.
+        """
+        with self._condition:
+            if self._try_enter(shared):
+                return True
+
+            if blocking is False:
+                return False
+
+            ticket = self._queue(shared)
+            deadline = None if timeout < 0 else monotonic() + timeout
+            try:
+                while not self._can_enter(ticket, shared):
+                    if deadline is None:
+                        self._condition.wait()
+                        continue
+
+                    remaining = deadline - monotonic()
+                    if (remaining <= 0) or (self._condition.wait(remaining) is False):
+                        if self._can_enter(ticket, shared):
+                            break
+                        return False
+
+                self._enter(shared)
+                return True
+            finally:
+                self._dequeue(ticket)
+
+    def enqueue(self, shared: bool = False) -> Optional[tuple]:
+        """
+        Acquire the lock if possible right away, queue a request for it otherwise.
+
+        Queued requests count as waiters for the policy (a queued writer blocks
+        new readers under ``writers``) without blocking the caller, which `poll`s
+        the returned ticket until it is granted or `cancel`s it (e.g. from `asyncio`).
+
+        :return: `None` if the lock was acquired, the ticket of the request otherwise.
+        """
+        with self._condition:
+            if self._try_enter(shared):
+                return None
+            return self._queue(shared)
+
+    def poll(self, ticket: tuple) -> bool:
+        """Acquire the lock for a request queued with `enqueue`, if its turn has come."""
+        with self._condition:
+            if not self._can_enter(ticket, ticket[1]):
+                return False
+            self._enter(ticket[1])
+            self._dequeue(ticket)
+            return True
+
+    def cancel(self, ticket: tuple):
+        """Withdraw a request queued with `enqueue` (and not granted by `poll`)."""
+        with self._condition:
+            self._dequeue(ticket)
+
+    def release(self, shared: bool = False):
+        """Release a lock previously acquired in the same mode."""
+        with self._condition:
+            if shared is True:
+                if self._readers == 0:
+                    raise RuntimeError("Cannot release an un-acquired shared lock!")
+                self._readers -= 1
+                self._disown()
+            else:
+                if self._writer is False:
+                    raise RuntimeError("Cannot release an un-acquired exclusive lock!")
+                self._writer = False
+            self._condition.notify_all()
+
+    def _try_enter(self, shared: bool) -> bool:
+        # a thread already holding the shared mode may always take it again
+        reentrant = (shared is True) and (self._writer is False) and (get_ident() in self._owners)
+        if reentrant or ((len(self._waiting) == 0) and self._can_enter(None, shared)):
+            self._enter(shared)
+            return True
+        return False
+
+    def _queue(self, shared: bool) -> tuple:
+        ticket = (next(self._tickets), shared)
+        self._waiting.append(ticket)
+        if shared is False:
+            self._waiting_writers += 1
+        return ticket
+
+    def _dequeue(self, ticket: tuple):
+        self._waiting.remove(ticket)
+        if ticket[1] is False:
+            self._waiting_writers -= 1
+        self._condition.notify_all()
+
+    def _enter(self, shared: bool):
+        if shared is True:
+            self._readers += 1
+            ident = get_ident()
+            self._owners[ident] = self._owners.get(ident, 0) + 1
+        else:
+            self._writer = True
+
+    def _disown(self):
+        """Forget a shared hold of this thread (or, released by another thread, of any holder)."""
+        ident = get_ident()
+        if ident not in self._owners:
+            ident = next(iter(self._owners))
+
+        holds = self._owners[ident] - 1
+        if holds == 0:
+            del self._owners[ident]
+        else:
+            self._owners[ident] = holds
+
+    def _can_enter(self, ticket, shared: bool) -> bool:
+        if (self._writer is True) or ((shared is False) and (self._readers > 0)):
+            return False
+
+        if self._policy == "readers":
+            return True
+
+        if self._policy == "writers":
+            return (shared is False) or (self._waiting_writers == 0)
+
+        # fair: only the head of the queue, or a run of readers behind it, may enter
+        for other in self._waiting:
+            if other is ticket:
+                return True
+            if (shared is False) or (other[1] is False):
+                return False
+        return True
+
+
+class LockView(object):
+    """One mode (shared or exclusive) of a `ReadWriteLock`, usable like a `threading.Lock`."""
+
+    def __init__(self, lock: ReadWriteLock, shared: bool):
+        self._lock, self._shared = lock, shared
+
+    @property
+    def shared(self) -> bool:
+        return self._shared
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        return self._lock.acquire(self._shared, blocking, timeout)
+
+    def release(self):
+        self._lock.release(self._shared)
+
+    def enqueue(self) -> Optional[tuple]:
+        return self._lock.enqueue(self._shared)
+
+    def poll(self, ticket: tuple) -> bool:
+        return self._lock.poll(ticket)
+
+    def cancel(self, ticket: tuple):
+        self._lock.cancel(ticket)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class LockTable(object):
+    """
+    Weak table of the locks shared by the handlers of this process.
+
+    The table is split into a fixed number of stripes, each one with its own
+    mutex, so lookups of existing entries take no lock at all and inserts only
+    serialize with other inserts falling on the same stripe.
+    Entries are dropped as soon as no handler references them anymore.
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._stripes = tuple(
+            (Lock(), WeakValueDictionary()) for _ in range(stripes)
+        )
+
+    def reset(self):
+        """Drop all the entries (the handlers already holding one keep it)."""
+        self._stripes = tuple(
+            (Lock(), WeakValueDictionary()) for _ in range(len(self._stripes))
+        )
+
+    def __len__(self) -> int:
+        return sum(len(entries) for _, entries in self._stripes)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the entry stored under `key` or `None`."""
+        lock, entries = self._stripes[hash(key) % len(self._stripes)]
+        return entries.get(key)
+
+    def _after_fork(self, default: str):
+        # the locks held by the parent's other threads would never be released
+        self.reset()
+
+    def dispatch(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the entry stored under `key`, creating it with `factory` if missing."""
+        lock, entries = self._stripes[hash(key) % len(self._stripes)]
+
+        instance = entries.get(key)
+        if instance is None:
+            with lock:
+                instance = entries.get(key)
+                if instance is None:
+                    # a strong reference is required
+                    instance = factory()
+                    entries[key] = instance
+        return instance
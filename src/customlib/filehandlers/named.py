@@ -0,0 +1,297 @@
+# -*- coding: UTF-8 -*-
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from hashlib import sha1
+from os import listdir, makedirs, remove, name as os_name
+from os.path import abspath, dirname, isdir, join
+from threading import Lock
+from time import monotonic
+from typing import IO, Iterator, Optional
+
+from .locks import ReadWriteLock
+from .utils import is_stale
+from ..filelockers import FileLocker, LOCK, AlreadyLocked
+
+
+class NamedLockManager(object):
+    """
+    Shared & exclusive locks on abstract resource names (tenant IDs, cache keys, ...)
+    between the threads & processes using the same `directory`.
+
+    Each name is backed by a sidecar lock file (named after a digest of the name
+    and spread over `fanout` sub-directories). The descriptors of the recently
+    used lock files are kept open, least recently used first closed once more
+    than `max_open` are idle, so locking a name again costs no open/close.
+
+    Lock files are only removed by `cleanup` while they are exclusively locked,
+    and holders check they still own the current file after locking it,
+    so a cleanup never breaks the exclusion. On windows, where open files cannot
+    be removed, `cleanup` closes a lock file first and skips it if it was opened again.
+
+    Example:
+        manager = NamedLockManager("/tmp/locks", max_open=1024)
+
+        with manager.exclusive("tenant-42"):
+            ...
+
+        with manager.shared("cache:users", timeout=1.0):
+            ...
+    """
+
+    def __init__(
+            self,
+            directory: str,
+            max_open: int = 1024,
+            fanout: int = 256,
+            suffix: str = ".lock",
+            lock_policy: str = "writers",
+    ):
+        """
+        :param directory: The directory holding the lock files.
+        :param max_open: The maximum number of idle lock files kept open.
+        :param fanout: The number of sub-directories the lock files are spread over.
+        :param suffix: The suffix of the lock files.
+        :param lock_policy: The policy of the in-process locks.
+        """
+        self._directory = abspath(directory)
+        self._max_open, self._fanout, self._suffix = max_open, fanout, suffix
+        self._lock_policy = lock_policy
+
+        self._file_lock = FileLocker()
+        self._lock = Lock()
+        self._active: dict = {}
+        self._idle: OrderedDict = OrderedDict()
+        self._folders: set = set()
+
+    def __len__(self) -> int:
+        """The number of names currently cached (locked, waited for or idle)."""
+        return len(self._active) + len(self._idle)
+
+    def path(self, name: str) -> str:
+        """Return the path of the lock file backing `name`."""
+        digest = sha1(name.encode("UTF-8")).hexdigest()
+        folder = f"{int(digest[:8], 16) % self._fanout:02x}" if self._fanout > 1 else ""
+        return join(self._directory, folder, f"{digest}{self._suffix}")
+
+    @contextmanager
+    def shared(self, name: str, timeout: float = None) -> Iterator[str]:
+        """Hold the shared lock of `name` for the duration of the `with` block."""
+        self.acquire(name, True, timeout)
+        try:
+            yield name
+        finally:
+            self.release(name, True)
+
+    @contextmanager
+    def exclusive(self, name: str, timeout: float = None) -> Iterator[str]:
+        """Hold the exclusive lock of `name` for the duration of the `with` block."""
+        self.acquire(name, False, timeout)
+        try:
+            yield name
+        finally:
+            self.release(name, False)
+
+    def acquire(self, name: str, shared: bool = False, timeout: float = None):
+        """
+        Acquire the lock of `name`.
+
+        :param name: The resource name.
+        :param shared: Acquire a shared lock instead of an exclusive one.
+        :param timeout: The maximum time (in seconds) to wait for the lock (`None` waits forever).
+        :raise AlreadyLocked: If the lock is still held by someone else after `timeout`.
+        """
+        started = monotonic()
+        entry = self._checkout(name)
+        try:
+            if entry.lock.acquire(shared, timeout=-1 if timeout is None else timeout) is False:
+                raise AlreadyLocked(
+                    f"Lock '{name}' not acquired in {timeout} seconds!",
+                    waited=monotonic() - started,
+                )
+
+            try:
+                self._lock_file(entry, shared, None if timeout is None else started + timeout)
+            except BaseException:
+                entry.lock.release(shared)
+                raise
+        except BaseException:
+            self._checkin(name, entry)
+            raise
+
+    def release(self, name: str, shared: bool = False):
+        """Release the lock of `name` previously acquired in the same mode."""
+        with self._lock:
+            entry = self._active.get(name)
+
+        if entry is None:
+            raise RuntimeError(f"Cannot release the un-acquired lock '{name}'!")
+
+        try:
+            with entry.mutex:
+                entry.holders -= 1
+                if entry.holders == 0:
+                    self._file_lock.release(entry.handle)
+        finally:
+            entry.lock.release(shared)
+            self._checkin(name, entry)
+
+    def cleanup(self) -> int:
+        """
+        Remove the lock files nobody holds, except the ones cached by this manager.
+        Returns the number of removed lock files.
+        """
+        with self._lock:
+            cached = {entry.path for entry in self._active.values()}
+            cached.update(entry.path for entry in self._idle.values())
+
+        removed = 0
+        for folder in self._walk():
+            for file in listdir(folder):
+                path = join(folder, file)
+                if (not file.endswith(self._suffix)) or (path in cached):
+                    continue
+
+                try:
+                    handle = open(path, "ab", buffering=0)
+                except FileNotFoundError:
+                    continue
+
+                with handle:
+                    try:
+                        self._file_lock.acquire(handle, LOCK.EX | LOCK.NB)
+                    except AlreadyLocked:
+                        continue
+
+                    try:
+                        if is_stale(handle, path):
+                            continue
+                        if os_name != "nt":
+                            remove(path)
+                            removed += 1
+                            continue
+                    finally:
+                        self._file_lock.release(handle)
+
+                # open files cannot be removed on windows, so the file is removed once closed,
+                # unless another process opened it in the meantime (and will lock it)
+                try:
+                    remove(path)
+                except (FileNotFoundError, PermissionError):
+                    continue
+                removed += 1
+
+        return removed
+
+    def close(self) -> int:
+        """Close the descriptors of the idle lock files."""
+        with self._lock:
+            entries = list(self._idle.values())
+            self._idle.clear()
+
+        for entry in entries:
+            entry.close()
+
+        return len(entries)
+
+    def _checkout(self, name: str) -> "_NamedLock":
+        """Return the entry of `name`, pinned until checked in."""
+        with self._lock:
+            entry = self._active.get(name)
+            if entry is None:
+                entry = self._idle.pop(name, None)
+                if entry is None:
+                    entry = _NamedLock(self.path(name), self._lock_policy)
+                self._active[name] = entry
+
+            entry.users += 1
+            return entry
+
+    def _checkin(self, name: str, entry: "_NamedLock"):
+        evicted = []
+
+        with self._lock:
+            entry.users -= 1
+            if entry.users > 0:
+                return
+
+            del self._active[name]
+            self._idle[name] = entry
+
+            while len(self._idle) > self._max_open:
+                evicted.append(self._idle.popitem(last=False)[1])
+
+        for other in evicted:
+            other.close()
+
+    def _lock_file(self, entry: "_NamedLock", shared: bool, deadline: Optional[float]):
+        """Lock the file of `entry` unless a thread of this process already does (shared mode)."""
+        if deadline is None:
+            entry.mutex.acquire()
+        elif entry.mutex.acquire(timeout=max(0.0, deadline - monotonic())) is False:
+            raise AlreadyLocked(f"Lock file '{entry.path}' not acquired in time!")
+
+        try:
+            if entry.holders == 0:
+                self._acquire(entry, LOCK.SH if shared is True else LOCK.EX, deadline)
+            entry.holders += 1
+        finally:
+            entry.mutex.release()
+
+    def _acquire(self, entry: "_NamedLock", flags: int, deadline: Optional[float]):
+        """Lock the current file of `entry`, reopening it if it was removed by a cleanup."""
+        while True:
+            if entry.handle is None:
+                entry.handle = self._open(entry.path)
+
+            timeout = None if deadline is None else max(0.0, deadline - monotonic())
+            self._file_lock.acquire(entry.handle, flags, timeout=timeout)
+            if not is_stale(entry.handle, entry.path):
+                return
+
+            self._file_lock.release(entry.handle)
+            entry.close()
+
+    def _open(self, path: str) -> IO:
+        folder = dirname(path)
+        if folder not in self._folders:
+            makedirs(folder, exist_ok=True)
+            self._folders.add(folder)
+
+        try:
+            return open(path, "ab", buffering=0)
+        except FileNotFoundError:
+            # the folder was removed in the meantime
+            self._folders.discard(folder)
+            makedirs(folder, exist_ok=True)
+            return open(path, "ab", buffering=0)
+
+    def _walk(self) -> Iterator[str]:
+        if not isdir(self._directory):
+            return
+
+        yield self._directory
+        for folder in listdir(self._directory):
+            path = join(self._directory, folder)
+            if isdir(path):
+                yield path
+
+
+class _NamedLock(object):
+    """Lock file of a name & the in-process lock of its holders."""
+
+    __slots__ = ("path", "lock", "mutex", "handle", "holders", "users")
+
+    def __init__(self, path: str, policy: str):
+        self.path = path
+        self.lock = ReadWriteLock(policy)
+        # serializes the file locking of the (shared) holders
+        self.mutex = Lock()
+        self.handle: Optional[IO] = None
+        self.holders: int = 0
+        self.users: int = 0
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
@@ -0,0 +1,202 @@
+# -*- coding: UTF-8 -*-
+
+from collections import OrderedDict
+from os import fstat
+from threading import Lock, Thread, Event
+from time import monotonic
+from typing import IO, Hashable, Optional, Tuple
+from weakref import WeakSet
+
+from .utils import file_key
+from ..filelockers import FileLocker
+
+# the pools of this process, so handlers of the same file can close their idle handles
+_POOLS: WeakSet = WeakSet()
+
+
+def evict_idle(file: str, keep: "HandlePool" = None) -> int:
+    """
+    Close the idle handles of `file` pooled by all the pools but `keep`.
+
+    Called by the handlers once they hold the in-process lock of `file`:
+    an idle handle keeps its file lock, which would stall them until reaped.
+    """
+    pools = [pool for pool in tuple(_POOLS) if (pool is not keep) and (len(pool) > 0)]
+    if len(pools) == 0:
+        return 0
+
+    key = file_key(file)
+    return sum(pool.discard(key) for pool in pools)
+
+
+class HandlePool(object):
+    """
+    Pool of open & locked file handles shared by `FileHandler` instances.
+
+    Handles are keyed by the file they point to (device & inode, see `utils.file_key`)
+    and the remaining `open` arguments and stay open (and locked) between `with` blocks.
+    Idle handles are closed once they exceed `idle_timeout` or, least recently used
+    first, when more than `max_size` handles are pooled. They are also closed as soon
+    as another handler of this process takes the in-process lock of their file.
+
+    Example:
+        pool = HandlePool(max_size=32, idle_timeout=1.0)
+
+        for line in lines:
+            with FileHandler("test_file.txt", "a", encoding="UTF-8", pool=pool) as fh:
+                fh.write(line)
+
+        pool.drain()
+    """
+
+    def __init__(self, max_size: int = 64, idle_timeout: float = 5.0):
+        self._max_size, self._idle_timeout = max_size, idle_timeout
+        self._file_lock = FileLocker()
+        self._lock = Lock()
+        self._idle: OrderedDict = OrderedDict()
+        self._files: dict = {}
+        self._wakeup = Event()
+        self._reaper: Optional[Thread] = None
+        _POOLS.add(self)
+
+    def __len__(self) -> int:
+        return len(self._idle)
+
+    @staticmethod
+    def key(file: str, *args, **kwargs) -> Tuple:
+        """
+        Return the pool key for the given `open` arguments.
+        The file is identified when the key is built, so build it right before `get`.
+        """
+        return file_key(file), args, tuple(sorted(kwargs.items()))
+
+    def get(self, key: Tuple) -> Optional[IO]:
+        """
+        Return the pooled handle stored under `key`
+        or `None` if there is no valid one available.
+        """
+        with self._lock:
+            keys = self._files.get(key[0])
+            if keys is None:
+                return None
+
+            evicted = [self._pop(other) for other in tuple(keys) if other != key]
+            handle = self._pop(key) if key in self._idle else None
+
+        # idle handles on the same file would otherwise deadlock with our own lock
+        for other in evicted:
+            self._close(other)
+
+        # handles are pooled under the file they have open, so a rotated,
+        # replaced or removed file has another key and its handle is not found
+        if handle is not None:
+            self._rewind(handle)
+        return handle
+
+    def put(self, key: Tuple, handle: IO) -> bool:
+        """
+        Return the (still locked) `handle` to the pool under `key`.
+        Returns `False` if the handle cannot be pooled.
+        """
+        if "x" in handle.mode:
+            return False
+
+        # the file might have been created by `open`, since the key was built
+        opened = fstat(handle.fileno())
+        key = ((opened.st_dev, opened.st_ino),) + key[1:]
+        evicted = []
+
+        with self._lock:
+            if key in self._idle:
+                evicted.append(self._pop(key))
+
+            self._idle[key] = (handle, monotonic())
+            self._files.setdefault(key[0], set()).add(key)
+
+            while len(self._idle) > self._max_size:
+                evicted.append(self._pop(next(iter(self._idle))))
+
+            if (self._reaper is None) or (self._reaper.is_alive() is False):
+                self._reaper = Thread(target=self._reap, name="HandlePoolReaper", daemon=True)
+                self._reaper.start()
+
+        for other in evicted:
+            self._close(other)
+
+        return True
+
+    def evict(self) -> int:
+        """Close the handles idle for more than `idle_timeout` seconds."""
+        deadline = monotonic() - self._idle_timeout
+
+        with self._lock:
+            expired = [
+                self._pop(key) for key, (handle, last_used) in tuple(self._idle.items())
+                if last_used <= deadline
+            ]
+
+        for handle in expired:
+            self._close(handle)
+
+        return len(expired)
+
+    def discard(self, file: Hashable) -> int:
+        """Close the idle handles of the file with key `file` (see `utils.file_key`)."""
+        with self._lock:
+            keys = self._files.get(file)
+            handles = [self._pop(key) for key in tuple(keys)] if keys is not None else []
+
+        for handle in handles:
+            self._close(handle)
+
+        return len(handles)
+
+    def drain(self) -> int:
+        """Close all the pooled handles."""
+        with self._lock:
+            handles = [self._pop(key) for key in tuple(self._idle)]
+
+        for handle in handles:
+            self._close(handle)
+
+        self._wakeup.set()
+        return len(handles)
+
+    def _pop(self, key: Tuple) -> IO:
+        handle, last_used = self._idle.pop(key)
+
+        keys = self._files.get(key[0])
+        keys.discard(key)
+        if len(keys) == 0:
+            del self._files[key[0]]
+
+        return handle
+
+    def _reap(self):
+        """Close the idle handles in the background, so other processes are not locked out."""
+        while True:
+            self._wakeup.wait(self._idle_timeout)
+            self._wakeup.clear()
+            self.evict()
+
+            with self._lock:
+                if len(self._idle) == 0:
+                    self._reaper = None
+                    return
+
+    def _close(self, handle: IO):
+        try:
+            self._file_lock.release(handle)
+        finally:
+            handle.close()
+
+    @staticmethod
+    def _rewind(handle: IO):
+        """Restore the state `open` would have left the handle in."""
+        mode = handle.mode
+
+        if "a" not in mode:
+            handle.seek(0)
+
+        if "w" in mode:
+            handle.truncate()
@@ -1,12 +1,327 @@
 # -*- coding: UTF-8 -*-
 
-from threading import RLock
-from weakref import WeakValueDictionary
+from errno import EINVAL, ENOSYS, EXDEV, EOPNOTSUPP, ENOTSUP
+from functools import partial
+from os import (
+    O_CREAT, O_EXCL, O_RDONLY, O_WRONLY, SEEK_CUR, SEEK_SET,
+    open as os_open, close, stat, fstat, fsync, lseek, read, write, name as os_name
+)
+from os.path import basename, dirname, join, realpath
+from secrets import token_hex
+from socket import socket
+from threading import Lock, Condition
+from time import monotonic, perf_counter
+from typing import IO, Any, Callable, Hashable, Optional, Tuple
 
+from .constants import CHUNK_SIZE
+from .locks import ReadWriteLock, LockTable, LockView
+from ..filelockers.metrics import MetricsSink
 
-def dispatch_lock(name: str, container: WeakValueDictionary) -> RLock:
-    if name not in container:
-        # a strong reference is required
-        instance = RLock()
-        container[name] = instance
-    return container[name]
+try:  # nt
+    from os import O_BINARY
+except ImportError:  # posix
+    O_BINARY = 0
+
+try:  # linux (python >= 3.8)
+    from os import copy_file_range
+except ImportError:
+    copy_file_range = None
+
+try:  # posix
+    from os import sendfile, pread
+except ImportError:  # nt
+    sendfile, pread = None, None
+
+try:  # posix
+    from fcntl import fcntl, F_GETFL
+    from os import O_APPEND
+except ImportError:  # nt
+    fcntl = None
+
+# errors meaning the kernel cannot do this copy, so the next method should be tried
+FALLBACK_ERRORS = (EINVAL, ENOSYS, EXDEV, EOPNOTSUPP, ENOTSUP)
+
+
+def file_key(name: str) -> Hashable:
+    """
+    Return the key identifying the file `name` points to: its `(st_dev, st_ino)`
+    so relative paths, symlinks and hard links to it share the same key,
+    or its canonical path if the file does not exist yet.
+    """
+    try:
+        result = stat(name)
+    except FileNotFoundError:
+        return realpath(name)
+    else:
+        return result.st_dev, result.st_ino
+
+
+def is_stale(handle: IO, path: str) -> bool:
+    """Check if the file was rotated, replaced or removed since `handle` was opened."""
+    try:
+        current = stat(path)
+    except FileNotFoundError:
+        return True
+
+    opened = fstat(handle.fileno())
+    return (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+
+
+def dispatch_lock(name: str, container: LockTable, policy: str = "writers") -> ReadWriteLock:
+    return container.dispatch(file_key(name), partial(ReadWriteLock, policy))
+
+
+def acquire_measured(lock: LockView, path: str, sink: MetricsSink) -> float:
+    """Acquire the in-process `lock`, recording its wait & contention, and return the acquisition time."""
+    started = perf_counter()
+
+    if lock.acquire(blocking=False) is False:
+        sink.increment(path, "thread_lock.contended")
+        lock.acquire()
+
+    acquired = perf_counter()
+    sink.observe(path, "thread_lock.wait", acquired - started)
+    return acquired
+
+
+def fsync_measured(fd: int, path: str, sink: MetricsSink):
+    """Call `fsync` on `fd`, recording its duration."""
+    started = perf_counter()
+    fsync(fd)
+    sink.observe(path, "fsync", perf_counter() - started)
+
+
+def get_mode(*args, **kwargs) -> str:
+    """Return the operating mode from the `open` arguments (without the file)."""
+    if len(args) > 0:
+        mode = args[0]
+    else:
+        mode = kwargs.get("mode", "r")
+    return mode.strip("tb+")
+
+
+def make_temp(file: str) -> Tuple[int, str]:
+    """
+    Create a new temporary file next to `file` and return its descriptor & path.
+    Unlike `tempfile.mkstemp`, the permissions follow the process umask.
+    """
+    while True:
+        path = join(dirname(file), f".{basename(file)}.{token_hex(8)}.tmp")
+        try:
+            fd = os_open(path, O_CREAT | O_EXCL | O_WRONLY | O_BINARY, 0o666)
+        except FileExistsError:
+            continue
+        return fd, path
+
+
+def sync_directory(path: str):
+    """Make the entries of the directory `path` (e.g. a rename) durable."""
+    if os_name == "nt":
+        # directories cannot be opened (nor synced) on windows
+        return
+
+    fd = os_open(path, O_RDONLY)
+    try:
+        fsync(fd)
+    finally:
+        close(fd)
+
+
+def dispatch_committer(handle: IO, container: LockTable) -> "GroupCommitter":
+    """Return the group committer shared by every handle opened on the same file."""
+    result = fstat(handle.fileno())
+    return container.dispatch((result.st_dev, result.st_ino), GroupCommitter)
+
+
+class GroupCommitter(object):
+    """
+    Coalesce the `fsync` calls issued for the same file.
+
+    The first writer to arrive becomes the leader: it waits up to `delay`
+    seconds (or until `batch` writers are queued) and issues a single `fsync`
+    on behalf of the (at most `batch`) oldest writers queued before the flush started.
+    The others block until a flush covering their data has completed.
+    """
+
+    def __init__(self):
+        self._condition = Condition(Lock())
+        self._queued: int = 0
+        self._synced: int = 0
+        self._leader: bool = False
+
+    def commit(self, fd: int, delay: float = 0.0, batch: int = 64):
+        """
+        Block until the data already written to `fd` is durable.
+
+        :param fd: A file descriptor opened on the file to be synced.
+        :param delay: The maximum time (in seconds) a leader waits for more writers.
+        :param batch: The maximum number of writers covered by a single flush.
+        """
+        with self._condition:
+            self._queued += 1
+            ticket = self._queued
+            self._condition.notify_all()
+
+            while self._synced < ticket:
+                if self._leader is True:
+                    self._condition.wait()
+                    continue
+
+                self._leader = True
+                try:
+                    deadline = monotonic() + delay
+                    while (self._queued - self._synced) < batch:
+                        timeout = deadline - monotonic()
+                        if timeout <= 0:
+                            break
+                        self._condition.wait(timeout)
+
+                    # the writers beyond `batch` are left to the next flush
+                    target = min(self._queued, self._synced + batch)
+
+                    self._condition.release()
+                    try:
+                        fsync(fd)
+                    finally:
+                        self._condition.acquire()
+
+                    self._synced = max(self._synced, target)
+                finally:
+                    self._leader = False
+                    self._condition.notify_all()
+
+
+def copy_range(
+        src: int,
+        dst: int,
+        offset: int = 0,
+        count: int = None,
+        chunk_size: int = CHUNK_SIZE,
+        progress: Callable[[int, int], Any] = None,
+) -> int:
+    """
+    Copy `count` bytes (up to the end of file by default) of the file descriptor `src`,
+    starting at `offset`, to the current position of the file descriptor `dst`.
+    The data stays in kernel space (`copy_file_range`, then `sendfile`) where possible,
+    otherwise it is moved in chunks through a buffer.
+
+    :param progress: Called with the number of bytes copied so far and the total.
+    :return: The number of bytes copied.
+    """
+    if count is None:
+        count = max(0, fstat(src).st_size - offset)
+
+    if _is_append(dst):
+        # `copy_file_range` (EBADF) & `sendfile` (EINVAL) refuse `O_APPEND` targets
+        methods = [_read_write]
+    else:
+        methods = [
+            method for method in (_copy_file_range, _sendfile_file, _read_write)
+            if method is not None
+        ]
+    return _transfer(methods, src, dst, offset, count, chunk_size, progress)
+
+
+def send_range(
+        sock: socket,
+        src: int,
+        offset: int = 0,
+        count: int = None,
+        chunk_size: int = CHUNK_SIZE,
+        progress: Callable[[int, int], Any] = None,
+) -> int:
+    """
+    Send `count` bytes (up to the end of file by default) of the file descriptor `src`,
+    starting at `offset`, through the blocking socket `sock`.
+    The data stays in kernel space (`sendfile`) where possible,
+    otherwise it is sent in chunks through a buffer.
+
+    :param progress: Called with the number of bytes sent so far and the total.
+    :return: The number of bytes sent.
+    """
+    if sock.gettimeout() == 0:
+        raise ValueError("Non-blocking sockets are not supported!")
+
+    if count is None:
+        count = max(0, fstat(src).st_size - offset)
+
+    def _sendfile_socket(source: int, _: Any, position: int, size: int) -> int:
+        return sendfile(sock.fileno(), source, position, size)
+
+    def _read_send(source: int, _: Any, position: int, size: int) -> int:
+        data = _pread(source, size, position)
+        sock.sendall(data)
+        return len(data)
+
+    methods = [_sendfile_socket, _read_send] if sendfile is not None else [_read_send]
+    return _transfer(methods, src, None, offset, count, chunk_size, progress)
+
+
+def _transfer(
+        methods: list,
+        src: int,
+        dst: Optional[int],
+        offset: int,
+        count: int,
+        chunk_size: int,
+        progress: Optional[Callable[[int, int], Any]],
+) -> int:
+    done = 0
+
+    for index, method in enumerate(methods):
+        try:
+            while done < count:
+                moved = method(src, dst, offset + done, min(chunk_size, count - done))
+                if moved == 0:
+                    # the file was truncated in the meantime
+                    return done
+
+                done += moved
+                if progress is not None:
+                    progress(done, count)
+            return done
+
+        except OSError as error:
+            if (error.errno not in FALLBACK_ERRORS) or (index == len(methods) - 1):
+                raise
+
+    return done
+
+
+def _is_append(fd: int) -> bool:
+    return (fcntl is not None) and (fcntl(fd, F_GETFL) & O_APPEND != 0)
+
+
+def _pread(src: int, size: int, offset: int) -> bytes:
+    if pread is not None:
+        return pread(src, size, offset)
+
+    # keep the descriptor's position untouched
+    position = lseek(src, 0, SEEK_CUR)
+    try:
+        lseek(src, offset, SEEK_SET)
+        return read(src, size)
+    finally:
+        lseek(src, position, SEEK_SET)
+
+
+def _read_write(src: int, dst: int, offset: int, size: int) -> int:
+    view = memoryview(_pread(src, size, offset))
+    size = len(view)
+    while len(view) > 0:
+        view = view[write(dst, view):]
+    return size
+
+
+if copy_file_range is not None:
+    def _copy_file_range(src: int, dst: int, offset: int, size: int) -> int:
+        return copy_file_range(src, dst, size, offset)
+else:
+    _copy_file_range = None
+
+if sendfile is not None:
+    def _sendfile_file(src: int, dst: int, offset: int, size: int) -> int:
+        # file to file `sendfile` is only supported by linux
+        return sendfile(dst, src, offset, size)
+else:
+    _sendfile_file = None
@@ -0,0 +1,496 @@
+# -*- coding: UTF-8 -*-
+
+import atexit
+from collections import deque
+from os import fsync, fstat, getpid, listdir, remove, rename, write, name as os_name
+from os.path import basename, dirname, exists, join
+from re import compile as re_compile, escape as re_escape
+from shutil import copyfileobj
+from threading import Thread, Event, Lock, Condition, get_ident
+from time import monotonic, perf_counter, time_ns
+from typing import IO, AnyStr, List, Optional, Tuple
+
+from .constants import FILE_LOCKS
+from .handlers import FileHandler
+from .pools import evict_idle
+from .utils import dispatch_lock, is_stale
+from ..filelockers import FileLocker, LOCK, AlreadyLocked
+
+try:  # posix
+    from os import writev, sysconf
+
+    IOV_MAX = sysconf("SC_IOV_MAX")
+except (ImportError, ValueError, OSError):  # nt
+    writev, IOV_MAX = None, 1024
+
+
+class AppendWriter(object):
+    """
+    Background writer appending the records of many producers to the same file.
+
+    Producers only push their records into a queue, while a single background
+    thread writes them in batches (with a vectored `writev` where available)
+    under one exclusive file lock per batch.
+
+    Once `high_water` records are pending, producers either block until the
+    writer catches up (`block=True`) or have their records dropped.
+    Pending records are written when the writer is closed.
+
+    Example:
+        with AppendWriter("test_file.log", encoding="UTF-8") as writer:
+            writer.write("Just testing out this cool new writer.\\n")
+
+        print(writer.stats())
+    """
+
+    def __init__(
+            self,
+            file: str,
+            encoding: str = "UTF-8",
+            high_water: int = 65536,
+            block: bool = True,
+            max_batch: int = 1024,
+            flush_interval: float = 0.01,
+            sync: bool = True,
+            lock_policy: str = "writers",
+            samples: int = 10000,
+    ):
+        """
+        :param file: The file to append to.
+        :param encoding: The encoding used for `str` records.
+        :param high_water: The maximum number of pending records.
+        :param block: Block the producers when `high_water` is reached (drop the records otherwise).
+        :param max_batch: The maximum number of records written at once.
+        :param flush_interval: The maximum time (in seconds) a record waits before being written.
+        :param sync: Call `fsync` after each batch.
+        :param lock_policy: The policy of the in-process file lock.
+        :param samples: The number of enqueue latencies kept for the statistics.
+        """
+        self._encoding = encoding
+        self._high_water, self._block = high_water, block
+        self._max_batch, self._flush_interval, self._sync = max_batch, flush_interval, sync
+
+        self._handle = open(file, "ab", buffering=0)
+        self._file_lock = FileLocker()
+        # a strong reference is required
+        self._thread_lock = dispatch_lock(file, FILE_LOCKS, lock_policy).exclusive
+
+        self._queue = deque()
+        self._latencies = deque(maxlen=samples)
+        self._wakeup = Event()
+        self._space = Condition(Lock())
+        self._stats_lock = Lock()
+        self._written, self._dropped, self._blocked = 0, 0, 0
+        # records taken from the queue but not yet written (and synced)
+        self._in_flight: int = 0
+        self._error: Optional[BaseException] = None
+        self._closing = False
+
+        self._thread = Thread(target=self._run, name="AppendWriter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __enter__(self) -> "AppendWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._closing
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def write(self, record: AnyStr, timeout: float = None) -> bool:
+        """
+        Queue the `record` to be written.
+
+        :param record: The `str` or `bytes` record.
+        :param timeout: The maximum time (in seconds) to block for if the queue is full.
+        :return: `False` if the record was dropped, `True` otherwise.
+        """
+        started = perf_counter()
+        self._check()
+
+        if len(self._queue) >= self._high_water:
+            if not self._wait_for_space(started, timeout):
+                with self._stats_lock:
+                    self._dropped += 1
+                return False
+
+        self._queue.append(record)
+        if len(self._queue) >= self._max_batch:
+            self._wakeup.set()
+
+        self._latencies.append(perf_counter() - started)
+        return True
+
+    def flush(self):
+        """Block until all the records queued so far are written (and synced, with `sync`)."""
+        self._check()
+        with self._space:
+            # records queued later do not delay the flush
+            target = self._written + self._in_flight + len(self._queue)
+            while (self._written < target) and (self._error is None):
+                self._wakeup.set()
+                self._space.wait(self._flush_interval)
+        self._check()
+
+    def close(self):
+        """Write the pending records and stop the background writer."""
+        if self._closing is True:
+            return
+
+        self._closing = True
+        self._wakeup.set()
+        self._thread.join()
+
+        # records queued by producers racing with `close`
+        if (self._error is None) and (len(self._queue) > 0):
+            self._write_batch()
+
+        self._handle.close()
+        atexit.unregister(self.close)
+
+        with self._space:
+            self._space.notify_all()
+
+        if self._error is not None:
+            raise self._error
+
+    def stats(self) -> dict:
+        """Return the writer's counters and the 99th percentile of the enqueue latency (in seconds)."""
+        latencies = sorted(self._latencies)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if len(latencies) > 0 else 0.0
+
+        with self._stats_lock:
+            return {
+                "written": self._written,
+                "pending": len(self._queue),
+                "dropped": self._dropped,
+                "blocked": self._blocked,
+                "p99_enqueue": p99,
+            }
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+        if self._closing is True:
+            raise ValueError("I/O operation on closed writer.")
+
+    def _wait_for_space(self, started: float, timeout: Optional[float]) -> bool:
+        """Apply back-pressure until the queue drops below `high_water`."""
+        if self._block is False:
+            return False
+
+        with self._stats_lock:
+            self._blocked += 1
+
+        with self._space:
+            while len(self._queue) >= self._high_water:
+                self._check()
+                self._wakeup.set()
+
+                if timeout is None:
+                    self._space.wait(self._flush_interval)
+                    continue
+
+                remaining = started + timeout - perf_counter()
+                if remaining <= 0:
+                    return False
+                self._space.wait(min(remaining, self._flush_interval))
+
+        return True
+
+    def _run(self):
+        try:
+            while True:
+                self._wakeup.wait(self._flush_interval)
+                self._wakeup.clear()
+                closing = self._closing
+
+                while len(self._queue) > 0:
+                    self._write_batch()
+
+                if closing is True:
+                    return
+        except BaseException as error:
+            self._error = error
+        finally:
+            with self._space:
+                self._space.notify_all()
+
+    def _write_batch(self):
+        batch = []
+        with self._space:
+            try:
+                while len(batch) < self._max_batch:
+                    batch.append(self._queue.popleft())
+            except IndexError:
+                pass
+            self._in_flight = len(batch)
+
+        batch = [record.encode(self._encoding) if isinstance(record, str) else record for record in batch]
+
+        with self._thread_lock:
+            evict_idle(self._handle.name)
+            self._file_lock.acquire(self._handle, LOCK.EX)
+            try:
+                self._write(batch)
+                if self._sync is True:
+                    fsync(self._handle.fileno())
+            finally:
+                self._file_lock.release(self._handle)
+
+        with self._space:
+            self._written += len(batch)
+            self._in_flight = 0
+            self._space.notify_all()
+
+    def _write(self, buffers: list):
+        fd = self._handle.fileno()
+
+        for index in range(0, len(buffers), IOV_MAX):
+            chunk = buffers[index:index + IOV_MAX]
+
+            if writev is not None:
+                written = writev(fd, chunk)
+                if written == sum(len(buffer) for buffer in chunk):
+                    continue
+                data = memoryview(b"".join(chunk))[written:]
+            else:
+                data = memoryview(b"".join(chunk))
+
+            # partial write (or no vectored I/O): write the remainder
+            while len(data) > 0:
+                data = data[write(fd, data):]
+
+
+class RotatingShardWriter(object):
+    """
+    Append writer spreading its writers over `shards` files, rotated by size and/or age.
+
+    Each process (or thread, with `shard_by="thread"`) appends to its own
+    `<file>.<index>` shard, so writers only contend with the few others
+    sharing the same shard. A shard is rotated by renaming it, which never
+    makes an appender wait: after locking a shard, appenders check it was not
+    rotated in the meantime and reopen it if it was. Rotated shards are merged
+    (oldest first) into `<file>` by a background thread and then removed.
+
+    On windows, open files can be neither renamed nor removed: a shard still open
+    in another process is not rotated (the next write of this process tries again)
+    and the handles are closed before the rotated shards are removed.
+
+    Example:
+        with RotatingShardWriter("test_file.log", shards=4, max_bytes=1 << 20) as writer:
+            writer.write("Just testing out this cool new writer.\\n")
+    """
+
+    __shard_by__: tuple = ("pid", "thread")
+
+    def __init__(
+            self,
+            file: str,
+            shards: int = 4,
+            shard_by: str = "pid",
+            max_bytes: int = 0,
+            max_age: float = 0,
+            encoding: str = "UTF-8",
+            sync: bool = True,
+            merge: bool = True,
+            merge_interval: float = 5.0,
+    ):
+        """
+        :param file: The file the rotated shards are merged into.
+        :param shards: The number of shard files.
+        :param shard_by: Assign the writers to the shards by `pid` or by `thread`.
+        :param max_bytes: Rotate a shard once it reaches this size (`0` disables it).
+        :param max_age: Rotate a shard once it is older than this (in seconds, `0` disables it).
+        :param encoding: The encoding used for `str` records.
+        :param sync: Call `fsync` after each write.
+        :param merge: Merge the rotated shards in a background thread.
+        :param merge_interval: The time (in seconds) between two background merges.
+        """
+        if shard_by not in self.__shard_by__:
+            raise ValueError(f"Unknown shard assignment '{shard_by}'!")
+
+        self._file, self._shards, self._shard_by = file, shards, shard_by
+        self._max_bytes, self._max_age = max_bytes, max_age
+        self._encoding, self._sync = encoding, sync
+        self._merge_interval = merge_interval
+
+        self._file_lock = FileLocker()
+        self._locks = tuple(Lock() for _ in range(shards))
+        self._handles: list = [None] * shards
+        self._opened: list = [0.0] * shards
+        self._pattern = re_compile(rf"^{re_escape(basename(file))}\.\d+\.(\d{{20}}-\d+)$")
+
+        self._wakeup = Event()
+        self._closing = False
+        self._merger: Optional[Thread] = None
+        if merge is True:
+            self._merger = Thread(target=self._run, name="RotatingShardMerger", daemon=True)
+            self._merger.start()
+
+    def __enter__(self) -> "RotatingShardWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def shard(self, index: int) -> str:
+        """Return the path of the shard `index`."""
+        return f"{self._file}.{index}"
+
+    def write(self, record: AnyStr) -> int:
+        """Append the `record` to the writer's shard and rotate it if needed."""
+        data = record.encode(self._encoding) if isinstance(record, str) else record
+
+        if self._shard_by == "pid":
+            index = getpid() % self._shards
+        else:
+            index = hash((getpid(), get_ident())) % self._shards
+
+        with self._locks[index]:
+            handle = self._acquire(index)
+            try:
+                view = memoryview(data)
+                while len(view) > 0:
+                    view = view[write(handle.fileno(), view):]
+                if self._sync is True:
+                    fsync(handle.fileno())
+                size = fstat(handle.fileno()).st_size
+            finally:
+                self._file_lock.release(handle)
+
+            if self._must_rotate(index, size):
+                self._rotate(index)
+
+        return len(data)
+
+    def rotate(self):
+        """Rotate all the shards of this process now."""
+        for index in range(self._shards):
+            with self._locks[index]:
+                if exists(self.shard(index)):
+                    self._rotate(index)
+
+    def merge(self) -> int:
+        """
+        Append the rotated shards to the main file (oldest first) and remove them.
+        Returns the number of merged shards (`0` if another process is merging).
+        """
+        with open(f"{self._file}.merge.lock", "a") as lock_handle:
+            try:
+                self._file_lock.acquire(lock_handle, LOCK.EX | LOCK.NB)
+            except AlreadyLocked:
+                return 0
+
+            try:
+                segments = sorted(self._segments(), key=lambda item: item[0])
+                for stamp, segment in segments:
+                    with open(segment, "rb") as source:
+                        # waits for the appenders still holding the rotated shard
+                        self._file_lock.acquire(source, LOCK.EX)
+                        with FileHandler(self._file, "ab") as target:
+                            copyfileobj(source, target)
+                        if os_name != "nt":
+                            # under the lock, so late appenders find it stale
+                            remove(segment)
+                    if os_name == "nt":
+                        # open files cannot be removed on windows, and a renamed
+                        # shard was open nowhere else, so only mergers open it
+                        remove(segment)
+                return len(segments)
+            finally:
+                self._file_lock.release(lock_handle)
+
+    def close(self):
+        """Stop the background merger and close the shards."""
+        if self._closing is True:
+            return
+
+        self._closing = True
+        self._wakeup.set()
+        if self._merger is not None:
+            self._merger.join()
+
+        for index in range(self._shards):
+            with self._locks[index]:
+                self._drop(index)
+
+    def _acquire(self, index: int) -> IO:
+        """Return the locked handle of the shard `index`, reopening it if it was rotated."""
+        path = self.shard(index)
+
+        while True:
+            if self._handles[index] is None:
+                self._handles[index] = open(path, "ab", buffering=0)
+                self._opened[index] = monotonic()
+
+            handle = self._file_lock.acquire(self._handles[index], LOCK.EX)
+            if not is_stale(handle, path):
+                return handle
+
+            self._file_lock.release(handle)
+            self._drop(index)
+
+    def _drop(self, index: int):
+        if self._handles[index] is not None:
+            self._handles[index].close()
+            self._handles[index] = None
+
+    def _must_rotate(self, index: int, size: int) -> bool:
+        if (self._max_bytes > 0) and (size >= self._max_bytes):
+            return True
+        return (self._max_age > 0) and ((monotonic() - self._opened[index]) >= self._max_age)
+
+    def _rotate(self, index: int):
+        """Rename the shard `index`, unless another process is already rotating it."""
+        path = self.shard(index)
+
+        with open(f"{path}.lock", "a") as lock_handle:
+            try:
+                self._file_lock.acquire(lock_handle, LOCK.EX | LOCK.NB)
+            except AlreadyLocked:
+                return
+
+            try:
+                handle = self._handles[index]
+                stale = (handle is not None) and is_stale(handle, path)
+                # open files cannot be renamed on windows
+                self._drop(index)
+                if stale is False:
+                    rename(path, f"{path}.{time_ns():020d}-{getpid()}")
+                    self._wakeup.set()
+            except FileNotFoundError:
+                pass
+            except PermissionError:
+                # still open in another process (windows), the next write tries again
+                if os_name != "nt":
+                    raise
+            finally:
+                self._file_lock.release(lock_handle)
+
+        self._drop(index)
+
+    def _segments(self) -> List[Tuple[str, str]]:
+        """Return the `(stamp, path)` of the rotated shards."""
+        folder = dirname(self._file)
+        segments = []
+
+        for name in listdir(folder or "."):
+            matched = self._pattern.match(name)
+            if matched is not None:
+                segments.append((matched.group(1), join(folder, name)))
+
+        return segments
+
+    def _run(self):
+        while self._closing is False:
+            self._wakeup.wait(self._merge_interval)
+            self._wakeup.clear()
+            self.merge()
@@ -2,12 +2,18 @@
 
 from .constants import LOCK
 from .exceptions import LockException, AlreadyLocked, FileToLarge, LockFlagsError
-from .handlers import AbstractLockHandler, FileLocker
+from .handlers import AbstractLockHandler, FileLocker, LockSet
+from .metrics import MetricsSink, MemorySink, CallbackSink, Histogram
 
 __all__ = [
     "LOCK",
     "AbstractLockHandler",
     "FileLocker",
+    "LockSet",
+    "MetricsSink",
+    "MemorySink",
+    "CallbackSink",
+    "Histogram",
     "LockException",
     "AlreadyLocked",
     "FileToLarge",
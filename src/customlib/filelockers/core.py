@@ -1,8 +1,11 @@
 # -*- coding: UTF-8 -*-
 
 from os import name as os_name
+from time import perf_counter
 from typing import IO
+from weakref import WeakKeyDictionary
 
+from . import metrics
 from .constants import LOCK
 from .exceptions import AlreadyLocked, LockException
 
@@ -83,8 +86,73 @@ if os_name == 'nt':
                 handle=handle
             )
 
+
+    def _overlapped(offset: int) -> OVERLAPPED:
+        overlapped = OVERLAPPED()
+        overlapped.Offset, overlapped.OffsetHigh = offset & 0xFFFFFFFF, offset >> 32
+        return overlapped
+
+
+    def _length(length: int) -> tuple:
+        if length == 0:
+            # up to (and beyond) the end of the file, like `fcntl`
+            return 0xFFFFFFFF, 0x7FFFFFFF
+        return length & 0xFFFFFFFF, length >> 32
+
+
+    def lock_range(handle: IO, flags: int, offset: int, length: int = 0):
+        mode = 0
+        if flags & LOCK.NB:
+            mode |= LOCKFILE_FAIL_IMMEDIATELY
+
+        if flags & LOCK.EX:
+            mode |= LOCKFILE_EXCLUSIVE_LOCK
+
+        os_fh = get_osfhandle(handle.fileno())
+        try:
+            LockFileEx(os_fh, mode, *_length(length), _overlapped(offset))
+        except PywintypesError as exc_value:
+            if exc_value.winerror == ERROR_LOCK_VIOLATION:
+                raise AlreadyLocked(
+                    LockException.LOCK_FAILED,
+                    exc_value.strerror,
+                    handle=handle
+                )
+            else:
+                raise
+
+
+    def unlock_range(handle: IO, offset: int, length: int = 0):
+        os_fh = get_osfhandle(handle.fileno())
+        try:
+            UnlockFileEx(os_fh, *_length(length), _overlapped(offset))
+        except PywintypesError as exc:
+            if exc.winerror != ERROR_NOT_LOCKED:
+                raise LockException(
+                    LockException.LOCK_FAILED,
+                    exc.strerror,
+                    handle=handle
+                )
+
 elif os_name == 'posix':  # pragma: no cover
-    from fcntl import flock
+    import fcntl
+    from errno import EACCES, EAGAIN
+    from fcntl import F_RDLCK, F_WRLCK, F_UNLCK, flock, lockf
+    from os import SEEK_SET
+    from struct import Struct
+    from sys import platform
+
+    if platform.startswith("linux"):
+        # open file description locks (linux >= 3.15) belong to the open file,
+        # not to the process, so they also exclude the threads of this process
+        # using different handles (the constants are only exported since python 3.9)
+        F_OFD_SETLK = getattr(fcntl, "F_OFD_SETLK", 37)
+        F_OFD_SETLKW = getattr(fcntl, "F_OFD_SETLKW", 38)
+
+        # struct flock: l_type, l_whence, l_start, l_len, l_pid (must be 0)
+        __flock = Struct("hhqqi4x")
+    else:
+        __flock = None
 
 
     def lock(handle: IO, flags: int):
@@ -103,6 +171,9 @@ elif os_name == 'posix':  # pragma: no cover
 
         try:
             flock(handle.fileno(), flags)
+        except BlockingIOError as exc_value:
+            # Only raised in NB (non-blocking) mode when someone else holds the lock
+            raise AlreadyLocked(exc_value, handle=handle)
         except locking_exceptions as exc_value:
             # The exception code varies on different systems, so we'll catch every IO error
             raise LockException(exc_value, handle=handle)
@@ -111,5 +182,91 @@ elif os_name == 'posix':  # pragma: no cover
     def unlock(handle: IO):
         flock(handle.fileno(), LOCK.UN)
 
+
+    def _fcntl_lock(handle: IO, flags: int, offset: int, length: int):
+        if __flock is None:
+            # process-associated locks: threads of this process never exclude each other
+            lockf(handle.fileno(), flags, length, offset, SEEK_SET)
+            return
+
+        if flags & LOCK.UN:
+            lock_type = F_UNLCK
+        elif flags & LOCK.EX:
+            lock_type = F_WRLCK
+        else:
+            lock_type = F_RDLCK
+
+        command = F_OFD_SETLK if (flags & (LOCK.NB | LOCK.UN)) else F_OFD_SETLKW
+        fcntl.fcntl(handle.fileno(), command, __flock.pack(lock_type, SEEK_SET, offset, length, 0))
+
+
+    def lock_range(handle: IO, flags: int, offset: int, length: int = 0):
+        # Locking with NB without EX or SH enabled results in an error
+        if (flags & LOCK.NB) and (not flags & (LOCK.SH | LOCK.EX)):
+            raise RuntimeError(
+                'When locking in NB (non-blocking) mode the SH (shared) '
+                'or EX (exclusive) flag must be specified as well.'
+            )
+
+        try:
+            _fcntl_lock(handle, flags, offset, length)
+        except OSError as exc_value:
+            if exc_value.errno in (EACCES, EAGAIN):
+                # Only raised in NB (non-blocking) mode when someone else holds the lock
+                raise AlreadyLocked(exc_value, handle=handle)
+            raise LockException(exc_value, handle=handle)
+
+
+    def unlock_range(handle: IO, offset: int, length: int = 0):
+        _fcntl_lock(handle, LOCK.UN, offset, length)
+
 else:  # pragma: no cover
     raise RuntimeError('File locking only defined for nt and posix platforms')
+
+
+_lock, _unlock = lock, unlock
+
+# plain ints, `IntFlag` operations are slow
+_NB, _SH_EX = int(LOCK.NB), int(LOCK.SH | LOCK.EX)
+
+# locks acquired while instrumented: handle -> (path, acquisition time),
+# weakly keyed, so a handle closed without `unlock` leaves no stale entry behind
+_held: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def lock(handle: IO, flags: int):
+    sink = metrics.SINK
+    if sink is None:
+        return _lock(handle, flags)
+
+    path = metrics.key(getattr(handle, "name", None))
+    started = perf_counter()
+
+    try:
+        # a first non-blocking attempt tells whether the lock is contended
+        _lock(handle, flags | _NB if flags & _SH_EX else flags)
+    except AlreadyLocked:
+        sink.increment(path, "file_lock.contended")
+        if flags & _NB:
+            raise
+        _lock(handle, flags)
+
+    acquired = perf_counter()
+    sink.observe(path, "file_lock.wait", acquired - started)
+    try:
+        _held[handle] = (path, acquired)
+    except TypeError:  # not weakly referenceable, the hold time is not measured
+        pass
+
+
+def unlock(handle: IO):
+    _unlock(handle)
+
+    if _held:
+        try:
+            held = _held.pop(handle, None)
+        except TypeError:
+            held = None
+        sink = metrics.SINK
+        if (held is not None) and (sink is not None):
+            sink.observe(held[0], "file_lock.hold", perf_counter() - held[1])
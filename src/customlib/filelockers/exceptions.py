@@ -20,7 +20,16 @@ class LockException(BaseLockException):
 
 
 class AlreadyLocked(LockException):
-    """Exception class for files already locked."""
+    """
+    Exception class for files already locked.
+    When raised by a timed acquisition, `attempts` and `waited`
+    report the number of attempts made and the time (in seconds) spent waiting.
+    """
+
+    def __init__(self, *args: Any, handle: Optional[IO] = None, attempts: int = 1, waited: float = 0.0):
+        super(AlreadyLocked, self).__init__(*args, handle=handle)
+
+        self.attempts, self.waited = attempts, waited
 
 
 class FileToLarge(LockException):
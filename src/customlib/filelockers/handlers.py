@@ -1,11 +1,17 @@
 # -*- coding: UTF-8 -*-
 
 from abc import ABC, abstractmethod
-from typing import IO
+from asyncio import sleep as async_sleep
+from inspect import signature
+from os import fstat
+from random import uniform
+from threading import Lock
+from time import monotonic, sleep
+from typing import IO, Iterable, Iterator, List, Optional, Tuple, Union
 
 from .constants import LOCK
-from .core import lock, unlock
-from .exceptions import LockFlagsError
+from .core import lock, unlock, lock_range, unlock_range
+from .exceptions import AlreadyLocked, LockFlagsError
 
 
 class AbstractLockHandler(ABC):
@@ -37,6 +43,21 @@ class AbstractLockHandler(ABC):
 
 
 class FileLocker(AbstractLockHandler):
+    """
+    File locker for whole files (`flock`) or byte ranges.
+
+    Byte-range locks are open file description locks on linux, so they are
+    owned by the handle: threads locking disjoint regions through their own
+    handles run in parallel, while overlapping regions exclude each other
+    just like separate processes do. Other posix platforms fall back to
+    process-associated `fcntl` locks, which never exclude threads of the same process.
+
+    On posix whole-file and byte-range locks are independent of each other.
+
+    With a `timeout`, the lock is polled in non-blocking mode with a jittered
+    exponential backoff and `AlreadyLocked` is raised once the deadline expires.
+    The attempts & waiting times of these acquisitions are reported by `stats`.
+    """
 
     __flags__: dict = {
         "w": LOCK.EX,
@@ -45,7 +66,39 @@ class FileLocker(AbstractLockHandler):
         "r": LOCK.SH,
     }
 
-    def acquire(self, handle: IO, flags: int = None) -> IO:
+    def __init__(self, *args, **kwargs):
+        super(FileLocker, self).__init__(*args, **kwargs)
+        self._stats_lock = Lock()
+        self._stats = dict.fromkeys(("acquired", "timeouts", "attempts", "waited", "max_waited"), 0)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if hasattr(self, "_handle") is True:
+            self.release(self._handle, *self._region())
+            del self._handle
+
+    @property
+    def stats(self) -> dict:
+        """
+        Counters of the acquisitions made with a `timeout`:
+            - ``acquired``: locks acquired;
+            - ``timeouts``: deadlines expired;
+            - ``attempts``: non-blocking attempts made;
+            - ``waited``: total time (in seconds) spent waiting;
+            - ``max_waited``: longest time (in seconds) spent waiting.
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def acquire(
+            self,
+            handle: IO,
+            flags: int = None,
+            offset: int = None,
+            length: int = 0,
+            timeout: float = None,
+            backoff: float = 0.001,
+            max_backoff: float = 0.05,
+    ) -> IO:
         """
         Acquire a lock on the given `handle`.
         If `flags` are not provided it will try to guess
@@ -53,9 +106,134 @@ class FileLocker(AbstractLockHandler):
 
         :param handle: The file handle.
         :param flags: The flags to be used to lock the handle.
+        :param offset: Lock only the bytes starting at `offset` instead of the whole file.
+        :param length: The number of bytes to lock from `offset`, `0` meaning up to (and past) the end.
+        :param timeout: The maximum time (in seconds) to wait for the lock (`None` waits forever).
+        :param backoff: The initial time (in seconds) to wait between attempts.
+        :param max_backoff: The maximum time (in seconds) to wait between attempts.
         :return: The newly locked handle.
+        :raise AlreadyLocked: If the lock is still held by someone else after `timeout`.
+        """
+
+        flags = self._get_flags(handle, flags)
+
+        if timeout is None:
+            self._lock(handle, flags, offset, length)
+            return handle
+
+        started, attempts = monotonic(), 0
+        delays = self._backoff(backoff, max_backoff)
+
+        while True:
+            attempts += 1
+            try:
+                self._lock(handle, flags | LOCK.NB, offset, length)
+            except AlreadyLocked as error:
+                remaining = started + timeout - monotonic()
+                if remaining <= 0:
+                    raise self._expired(handle, attempts, started) from error
+                sleep(min(next(delays), remaining))
+            else:
+                self._record(attempts, monotonic() - started, True)
+                return handle
+
+    async def acquire_async(
+            self,
+            handle: IO,
+            flags: int = None,
+            delay: float = 0.001,
+            max_delay: float = 0.05,
+            timeout: float = None,
+    ) -> IO:
         """
+        Acquire a lock on the given `handle` without blocking the event loop.
+        The lock is polled in non-blocking mode, backing off exponentially
+        (with jitter) from `delay` up to `max_delay` seconds between attempts.
 
+        :param handle: The file handle.
+        :param flags: The flags to be used to lock the handle.
+        :param delay: The initial time (in seconds) to wait between attempts.
+        :param max_delay: The maximum time (in seconds) to wait between attempts.
+        :param timeout: The maximum time (in seconds) to wait for the lock (`None` waits forever).
+        :return: The newly locked handle.
+        :raise AlreadyLocked: If the lock is still held by someone else after `timeout`.
+        """
+        flags = self._get_flags(handle, flags)
+
+        if (flags & LOCK.NB) and (timeout is None):
+            lock(handle, flags)
+            return handle
+
+        started, attempts = monotonic(), 0
+        delays = self._backoff(delay, max_delay)
+
+        while True:
+            attempts += 1
+            try:
+                lock(handle, flags | LOCK.NB)
+            except AlreadyLocked as error:
+                if timeout is None:
+                    await async_sleep(next(delays))
+                    continue
+
+                remaining = started + timeout - monotonic()
+                if remaining <= 0:
+                    raise self._expired(handle, attempts, started) from error
+                await async_sleep(min(next(delays), remaining))
+            else:
+                if timeout is not None:
+                    self._record(attempts, monotonic() - started, True)
+                return handle
+
+    def release(self, handle: IO, offset: int = None, length: int = 0):
+        """Unlock the file handle (or only the byte range `offset` & `length` of it)."""
+        if offset is None:
+            unlock(handle)
+        else:
+            unlock_range(handle, offset, length)
+
+    @staticmethod
+    def _lock(handle: IO, flags: int, offset: Optional[int], length: int):
+        if offset is None:
+            lock(handle, flags)
+        else:
+            lock_range(handle, flags, offset, length)
+
+    @staticmethod
+    def _backoff(delay: float, max_delay: float) -> Iterator[float]:
+        """Exponential delays with "equal jitter", so competing waiters do not retry in lockstep."""
+        while True:
+            yield uniform(delay / 2, delay)
+            delay = min(delay * 2, max_delay)
+
+    def _expired(self, handle: IO, attempts: int, started: float) -> AlreadyLocked:
+        waited = monotonic() - started
+        self._record(attempts, waited, False)
+        return AlreadyLocked(
+            f"Lock not acquired after {attempts} attempts in {waited:.3f} seconds!",
+            handle=handle,
+            attempts=attempts,
+            waited=waited,
+        )
+
+    def _record(self, attempts: int, waited: float, acquired: bool):
+        with self._stats_lock:
+            stats = self._stats
+            stats["acquired" if acquired is True else "timeouts"] += 1
+            stats["attempts"] += attempts
+            stats["waited"] += waited
+            stats["max_waited"] = max(stats["max_waited"], waited)
+
+    def _region(self) -> Tuple[Optional[int], int]:
+        """Return the byte range (`offset`, `length`) locked as a context-manager."""
+        arguments = signature(self.acquire).bind(*self._args, **self._kwargs).arguments
+        return arguments.get("offset"), arguments.get("length", 0)
+
+    def _get_flags(self, handle: IO, flags: int = None) -> int:
+        """
+        Return the flags to lock the `handle` with.
+        If `flags` are not provided they are guessed from the handle's operating mode.
+        """
         mode = self._get_mode(handle)
 
         if flags is None:
@@ -64,15 +242,178 @@ class FileLocker(AbstractLockHandler):
         elif (mode == "w") and (flags in (LOCK.SH | LOCK.NB)):
             raise LockFlagsError(f"Wrong flags used on this operating mode of the handle (`{mode}`)!")
 
-        lock(handle, flags)
-        return handle
-
-    def release(self, handle: IO):
-        """Unlock the file handle."""
-        unlock(handle)
+        return flags
 
     @staticmethod
     def _get_mode(handle: IO) -> str:
         """Return the handle's operating mode."""
         mode = handle.mode
         return mode.strip("tb+")
+
+
+class LockSet(object):
+    """
+    All-or-nothing lock on many files at once, given as handles or paths
+    (paths are opened in `"ab"` mode for the lifetime of the locks).
+
+    The files are always locked in the same canonical order, by device & inode,
+    and all in non-blocking mode: if one of them is already locked, the ones
+    acquired so far are released and the whole set is retried after a jittered
+    exponential backoff, so transactions locking overlapping sets never deadlock
+    nor hold some of their files while waiting for the others.
+
+    Example:
+        with LockSet(["accounts.db", "journal.log"], flags=LOCK.EX, timeout=5.0) as handles:
+            ...
+    """
+
+    def __init__(
+            self,
+            resources: Iterable[Union[str, IO, Tuple[Union[str, IO], int]]] = (),
+            flags: int = None,
+            timeout: float = None,
+            backoff: float = 0.001,
+            max_backoff: float = 0.05,
+    ):
+        """
+        :param resources: The handles or paths to lock, optionally paired with their own flags.
+        :param flags: The default flags (guessed from the handles' operating mode if not provided).
+        :param timeout: The maximum time (in seconds) to wait for the whole set (`None` waits forever).
+        :param backoff: The initial time (in seconds) to wait between attempts.
+        :param max_backoff: The maximum time (in seconds) to wait between attempts.
+        """
+        self._flags, self._timeout = flags, timeout
+        self._backoff, self._max_backoff = backoff, max_backoff
+
+        self._file_lock = FileLocker()
+        self._resources: list = []
+        self._handles: Optional[list] = None
+        self._opened: list = []
+        self._locked: list = []
+
+        self.attempts, self.waited = 0, 0.0
+
+        for resource in resources:
+            if isinstance(resource, tuple):
+                self.add(*resource)
+            else:
+                self.add(resource)
+
+    def __len__(self) -> int:
+        return len(self._resources)
+
+    def __enter__(self) -> List[IO]:
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    @property
+    def locked(self) -> bool:
+        return self._handles is not None
+
+    def add(self, resource: Union[str, IO], flags: int = None) -> "LockSet":
+        """Add the handle or path `resource` (locked with `flags`) to the set."""
+        if self._handles is not None:
+            raise RuntimeError("Cannot add resources to an acquired lock set!")
+
+        self._resources.append((resource, flags))
+        return self
+
+    def acquire(self) -> List[IO]:
+        """
+        Lock all the resources of the set.
+
+        :return: The locked handles, in the order the resources were added.
+        :raise AlreadyLocked: If the set could not be locked within `timeout`.
+        """
+        if self._handles is not None:
+            raise RuntimeError("The lock set is already acquired!")
+
+        handles = []
+        try:
+            for resource, _ in self._resources:
+                if isinstance(resource, str):
+                    resource = open(resource, "ab")
+                    self._opened.append(resource)
+                handles.append(resource)
+
+            self._lock_all(self._plan(handles))
+        except BaseException:
+            self._close()
+            raise
+
+        self._handles = handles
+        return handles
+
+    def release(self):
+        """Unlock all the resources of the set (and close the files it opened)."""
+        if self._handles is None:
+            return
+
+        try:
+            while len(self._locked) > 0:
+                self._file_lock.release(self._locked.pop())
+        finally:
+            self._close()
+            self._handles = None
+
+    def _plan(self, handles: List[IO]) -> List[Tuple[IO, int]]:
+        """Return the distinct files to lock, with their strongest flags, in canonical order."""
+        files = {}
+
+        for handle, (_, flags) in zip(handles, self._resources):
+            flags = self._file_lock._get_flags(handle, self._flags if flags is None else flags)
+            flags = LOCK.SH if (flags is not None) and (flags & LOCK.SH) else LOCK.EX
+
+            status = fstat(handle.fileno())
+            key = (status.st_dev, status.st_ino)
+
+            # the same file locked twice through different handles would deadlock
+            if key in files:
+                other, other_flags = files[key]
+                if (flags & LOCK.EX) or (other_flags & LOCK.EX):
+                    flags = LOCK.EX
+                handle = other
+
+            files[key] = (handle, flags)
+
+        return [files[key] for key in sorted(files)]
+
+    def _lock_all(self, plan: List[Tuple[IO, int]]):
+        started, attempts = monotonic(), 0
+        delays = FileLocker._backoff(self._backoff, self._max_backoff)
+
+        while True:
+            attempts += 1
+            try:
+                for handle, flags in plan:
+                    self._file_lock.acquire(handle, flags | LOCK.NB)
+                    self._locked.append(handle)
+
+            except AlreadyLocked as error:
+                while len(self._locked) > 0:
+                    self._file_lock.release(self._locked.pop())
+
+                waited = monotonic() - started
+                if (self._timeout is not None) and (waited >= self._timeout):
+                    self.attempts, self.waited = attempts, waited
+                    raise AlreadyLocked(
+                        f"Lock set not acquired after {attempts} attempts in {waited:.3f} seconds!",
+                        handle=error.handle,
+                        attempts=attempts,
+                        waited=waited,
+                    ) from error
+
+                delay = next(delays)
+                if self._timeout is not None:
+                    delay = min(delay, self._timeout - waited)
+                sleep(delay)
+
+            else:
+                self.attempts, self.waited = attempts, monotonic() - started
+                return
+
+    def _close(self):
+        while len(self._opened) > 0:
+            self._opened.pop().close()
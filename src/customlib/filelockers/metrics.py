@@ -0,0 +1,152 @@
+# -*- coding: UTF-8 -*-
+
+from abc import ABC, abstractmethod
+from os.path import abspath
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+
+# The active sink, `None` while the instrumentation is disabled.
+# Hooks read it once per call, so disabled hooks cost a single global lookup.
+SINK: Optional["MetricsSink"] = None
+
+
+def enable(sink: "MetricsSink" = None) -> "MetricsSink":
+    """Start recording the lock & fsync metrics into `sink` (a new `MemorySink` by default)."""
+    global SINK
+
+    if sink is None:
+        sink = MemorySink()
+
+    SINK = sink
+    return sink
+
+
+def disable():
+    """Stop recording the lock & fsync metrics."""
+    global SINK
+    SINK = None
+
+
+def key(name: Any) -> str:
+    """Return the path the metrics of the file `name` are recorded under."""
+    return abspath(name) if isinstance(name, str) else str(name)
+
+
+class Histogram(object):
+    """
+    Histogram of durations with power-of-two microsecond buckets
+    (bucket `i` counts the values below `2 ** i` microseconds).
+    """
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    __size__: int = 40
+
+    def __init__(self):
+        self.buckets = [0] * self.__size__
+        self.count, self.total, self.max = 0, 0.0, 0.0
+
+    def add(self, seconds: float):
+        index = int(seconds * 1e6).bit_length()
+        self.buckets[index if index < self.__size__ else -1] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Return the upper bound (in seconds) of the bucket holding the `q` quantile."""
+        if self.count == 0:
+            return 0.0
+
+        rank, seen = q * self.count, 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return min((1 << index) / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count > 0 else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class MetricsSink(ABC):
+    """
+    Destination of the lock & fsync metrics.
+
+    Metrics:
+        - ``file_lock.wait``, ``file_lock.hold``, ``file_lock.contended``: the `flock` file locks;
+        - ``thread_lock.wait``, ``thread_lock.hold``, ``thread_lock.contended``: the in-process file locks;
+        - ``fsync``: the `fsync` calls of `FileHandler`.
+    """
+
+    @abstractmethod
+    def observe(self, path: str, metric: str, seconds: float):
+        """Record a duration (in seconds)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def increment(self, path: str, metric: str):
+        """Record an event (a contended lock)."""
+        raise NotImplementedError
+
+
+class MemorySink(MetricsSink):
+    """Keeps a histogram per path & metric in memory."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._histograms: Dict[tuple, Histogram] = {}
+        self._counters: Dict[tuple, int] = {}
+
+    def observe(self, path: str, metric: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get((path, metric))
+            if histogram is None:
+                histogram = self._histograms[(path, metric)] = Histogram()
+            histogram.add(seconds)
+
+    def increment(self, path: str, metric: str):
+        with self._lock:
+            self._counters[(path, metric)] = self._counters.get((path, metric), 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the metrics recorded so far as `{path: {metric: value}}`:
+        a `Histogram.summary()` for durations and an `int` for counters.
+        """
+        with self._lock:
+            result = {}
+            for (path, metric), histogram in self._histograms.items():
+                result.setdefault(path, {})[metric] = histogram.summary()
+            for (path, metric), count in self._counters.items():
+                result.setdefault(path, {})[metric] = count
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+class CallbackSink(MetricsSink):
+    """
+    Forwards each metric to `callback(path, metric, value)`,
+    the value being a duration in seconds or `1` for counters.
+    """
+
+    def __init__(self, callback: Callable[[str, str, float], Any]):
+        self._callback = callback
+
+    def observe(self, path: str, metric: str, seconds: float):
+        self._callback(path, metric, seconds)
+
+    def increment(self, path: str, metric: str):
+        self._callback(path, metric, 1)
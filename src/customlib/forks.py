@@ -0,0 +1,74 @@
+# -*- coding: UTF-8 -*-
+
+from sys import excepthook, exc_info
+from threading import Lock
+from weakref import WeakSet
+
+try:  # posix
+    from os import register_at_fork
+except ImportError:  # nt
+    register_at_fork = None
+
+# what happens to a singleton in a forked child:
+#   - ``keep``: the inherited instance is used as is;
+#   - ``reset``: the instance is dropped and built again on next use;
+#   - ``rebuild``: the instance is built again right after the fork.
+POLICIES: tuple = ("keep", "reset", "rebuild")
+
+_lock = Lock()
+_registered: bool = False
+_default = None
+
+# lock tables are reset before the singletons, which may need them to rebuild
+_tables = WeakSet()
+_objects = WeakSet()
+
+
+def register(target, table: bool = False):
+    """
+    Register `target` to be reset in forked children (once enabled),
+    by calling its `_after_fork(default)` method with the default policy.
+    """
+    (_tables if table is True else _objects).add(target)
+
+
+def enable(default: str = "keep"):
+    """
+    Reset the lock tables and apply the fork policies of the singletons
+    in every child forked from now on (`default` applies to the singletons
+    without a policy of their own). Does nothing where `fork` is not available.
+    """
+    global _registered, _default
+
+    if default not in POLICIES:
+        raise ValueError(f"Unknown fork policy '{default}'!")
+
+    with _lock:
+        _default = default
+        if (_registered is False) and (register_at_fork is not None):
+            register_at_fork(after_in_child=_after_fork)
+            _registered = True
+
+
+def disable():
+    """Stop resetting the registered objects in forked children."""
+    global _default
+    _default = None
+
+
+def check_policy(policy: str):
+    if (policy is not None) and (policy not in POLICIES):
+        raise ValueError(f"Unknown fork policy '{policy}'!")
+
+
+def _after_fork():
+    if _default is None:
+        return
+
+    for targets in (_tables, _objects):
+        for target in list(targets):
+            try:
+                target._after_fork(_default)
+            except Exception:
+                # report it, but still reset the others
+                excepthook(*exc_info())
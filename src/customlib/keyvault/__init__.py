@@ -2,10 +2,11 @@
 
 from keyring.errors import PasswordSetError, PasswordDeleteError
 
+from .caches import KeyCache
 from .exceptions import PasswordGetError
 from .handlers import Vault, KeyVault
 
 __all__ = [
-    "Vault", "KeyVault",
+    "Vault", "KeyVault", "KeyCache",
     "PasswordSetError", "PasswordDeleteError", "PasswordGetError",
 ]
@@ -0,0 +1,129 @@
+# -*- coding: UTF-8 -*-
+
+from collections import OrderedDict
+from hashlib import sha256
+from hmac import new as hmac_new
+from os import urandom
+from threading import Lock
+from time import monotonic
+from typing import Callable, Optional
+
+from cryptography.fernet import Fernet
+
+from .. import forks
+
+
+class KeyCache(object):
+    """
+    Process-wide cache of the derived encryption keys (and their `Fernet` instances),
+    so building a `KeyVault` with a known password does not run the key derivation again.
+
+    Entries are keyed by a keyed digest (HMAC-SHA256 with a random per-process secret)
+    of the password & salt, so the cache holds neither of them. They expire `ttl`
+    seconds after being derived and are evicted least recently used first above `max_size`.
+
+    Evicted, expired & cleared keys are only released, not zeroed: the key derivation
+    and `Fernet` keep them in immutable `bytes`, which cannot be wiped, so they stay in
+    memory until it is reused. Strict deployments can opt out with `disable()`
+    (or `KeyVault(cache=False)` per vault).
+    """
+
+    def __init__(self, max_size: int = 16, ttl: float = 300.0):
+        """
+        :param max_size: The maximum number of derived keys kept.
+        :param ttl: The time (in seconds) a derived key is kept (`None` keeps it until evicted).
+        """
+        self._max_size, self._ttl = max_size, ttl
+        self._secret = urandom(32)
+        self._lock = Lock()
+        self._entries: OrderedDict = OrderedDict()
+        self._stats = dict.fromkeys(("hits", "misses", "evictions", "expirations"), 0)
+        self.enabled: bool = True
+        forks.register(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def enable(self):
+        """Cache the derived keys (the default)."""
+        self.enabled = True
+
+    def disable(self):
+        """Stop caching the derived keys & drop the cached ones."""
+        self.enabled = False
+        self.clear()
+
+    def get(self, value: bytes, salt: bytes, derive: Callable[[bytes, bytes], bytes]) -> Fernet:
+        """
+        Return the `Fernet` instance of the key derived from `value` & `salt`,
+        calling `derive(value, salt)` (returning a Base64 encoded key) if not cached.
+        """
+        if self.enabled is False:
+            return Fernet(derive(value, salt))
+
+        digest = self._digest(value, salt)
+
+        with self._lock:
+            entry = self._lookup(digest)
+            if entry is not None:
+                self._stats["hits"] += 1
+                return entry.fernet
+            self._stats["misses"] += 1
+
+        # derived outside the lock (slow), a concurrent miss only wastes the work
+        entry = _CachedKey(Fernet(derive(value, salt)), None if self._ttl is None else monotonic() + self._ttl)
+
+        with self._lock:
+            if self.enabled is True:
+                self._store(digest, entry)
+
+        return entry.fernet
+
+    def clear(self):
+        """Drop all the cached keys."""
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> dict:
+        """Return the cache statistics (`hits`, `misses`, `evictions`, `expirations`, `size`, `max_size`)."""
+        with self._lock:
+            return dict(self._stats, size=len(self._entries), max_size=self._max_size)
+
+    def _digest(self, value: bytes, salt: bytes) -> bytes:
+        # length-prefixed, so (value, salt) pairs cannot collide by shifting bytes
+        message = len(value).to_bytes(8, "big") + value + salt
+        return hmac_new(self._secret, message, sha256).digest()
+
+    def _lookup(self, digest: bytes) -> Optional["_CachedKey"]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+
+        if (entry.expires is not None) and (entry.expires <= monotonic()):
+            del self._entries[digest]
+            self._stats["expirations"] += 1
+            return None
+
+        self._entries.move_to_end(digest)
+        return entry
+
+    def _store(self, digest: bytes, entry: "_CachedKey"):
+        self._entries.pop(digest, None)
+        self._entries[digest] = entry
+
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _after_fork(self, default: str):
+        # the lock might be held by a thread that does not exist in the child
+        self._lock = Lock()
+
+
+class _CachedKey(object):
+    """The `Fernet` instance of a derived key & its expiration time."""
+
+    __slots__ = ("fernet", "expires")
+
+    def __init__(self, fernet: Fernet, expires: Optional[float]):
+        self.fernet, self.expires = fernet, expires
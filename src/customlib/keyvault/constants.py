@@ -0,0 +1,6 @@
+# -*- coding: UTF-8 -*-
+
+from .caches import KeyCache
+
+# process-wide cache of the derived encryption keys (see `KeyVault.password`)
+KEY_CACHE = KeyCache(max_size=16, ttl=300.0)
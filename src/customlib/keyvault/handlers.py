@@ -16,6 +16,7 @@ from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from keyring import set_password, get_password, delete_password
 from keyring.errors import PasswordSetError, PasswordDeleteError
 
+from .constants import KEY_CACHE
 from .exceptions import PasswordGetError
 from .utils import encode, decode
 
@@ -133,16 +134,26 @@ class Vault(BaseVault):
 
 
 class KeyVault(Vault):
-    """`keyring` handle with password encryption."""
+    """
+    `keyring` handle with password encryption.
+
+    The derived encryption keys are cached process-wide (see `constants.KEY_CACHE`),
+    unless `cache` is `False` (or the cache is disabled with `KEY_CACHE.disable()`).
+    """
 
-    def __init__(self):
-        self.__key = None
+    def __init__(self, cache: bool = True):
+        self.__cache = cache
+        self.__fernet = None
 
     def password(self, value: str, salt: str = None):
         """Set a new symmetrically derived encryption key."""
         if salt is None:
             salt = self._get_mac()
-        self.__key = Symmetric(encode(salt)).key(encode(value))
+
+        if self.__cache is True:
+            self.__fernet = KEY_CACHE.get(encode(value), encode(salt), self._derive)
+        else:
+            self.__fernet = Fernet(self._derive(encode(value), encode(salt)))
 
     def get_password(self, service: str, username: str) -> str:
         """Fetch & decrypt a password from the keyring."""
@@ -160,15 +171,19 @@ class KeyVault(Vault):
 
     def _encrypt(self, value: str) -> str:
         """Encrypt the `value` using the symmetrically derived encryption key."""
-        return decode(Fernet(self.__key).encrypt(encode(value)))
+        return decode(self.__fernet.encrypt(encode(value)))
 
     def _decrypt(self, value: str) -> str:
         """Decrypt the `value` using the symmetrically derived encryption key."""
         try:
-            return decode(Fernet(self.__key).decrypt(encode(value)))
+            return decode(self.__fernet.decrypt(encode(value)))
         except InvalidToken as invalid_token:
             raise invalid_token
 
+    @staticmethod
+    def _derive(value: bytes, salt: bytes) -> bytes:
+        return Symmetric(salt).key(value)
+
     @staticmethod
     def _get_mac():
         """
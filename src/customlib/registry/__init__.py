@@ -1,5 +1,7 @@
 # -*- coding: UTF-8 -*-
 
+from .caches import InstancePool
 from .handlers import ClassRegistry, MutableClassRegistry
+from .index import KeyIndex
 
-__all__ = ["ClassRegistry", "MutableClassRegistry"]
+__all__ = ["ClassRegistry", "MutableClassRegistry", "InstancePool", "KeyIndex"]
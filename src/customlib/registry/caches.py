@@ -0,0 +1,144 @@
+# -*- coding: UTF-8 -*-
+
+from collections import deque
+from contextlib import contextmanager
+from threading import Condition
+from time import monotonic
+from typing import Any, Callable, Iterator, Union
+
+from ..singletons import MultitonCache
+
+# instance caching policies of the registry entries:
+#   - ``shared``: one instance, built by the first `get` (later arguments are ignored);
+#   - ``lru``: one instance per distinct set of arguments, least recently used evicted above `max_size`;
+#   - ``pool``: up to `max_size` interchangeable instances, borrowed by `get` & returned by `release`.
+POLICIES: tuple = ("shared", "lru", "pool")
+
+# sentinel for "no idle instance, build one"
+_MISSING = object()
+
+
+class InstancePool(object):
+    """
+    Bounded pool of interchangeable instances built by `factory`.
+
+    `get` borrows an idle instance (or builds one, with its arguments, while fewer
+    than `max_size` exist) and waits for one to be returned with `put` otherwise.
+
+    Example:
+        pool = InstancePool(Parser, max_size=4)
+
+        with pool.lease() as parser:
+            parser.parse(text)
+    """
+
+    def __init__(self, factory: Callable, max_size: int = 8, timeout: float = None):
+        """
+        :param factory: Builds the instances.
+        :param max_size: The maximum number of instances (idle & borrowed).
+        :param timeout: The maximum time (in seconds) `get` waits for an instance (`None` waits forever).
+        """
+        self._factory, self._max_size, self._timeout = factory, max_size, timeout
+        self._available = Condition()
+        self._idle = deque()
+        self._size: int = 0
+        self._stats = dict.fromkeys(("hits", "misses", "waits"), 0)
+
+    def __len__(self) -> int:
+        return len(self._idle)
+
+    def get(self, *args, **kwargs) -> Any:
+        """
+        Borrow an instance (the arguments are only used to build new ones).
+
+        :raise TimeoutError: If no instance is returned within the pool's `timeout`.
+        """
+        with self._available:
+            instance = self._take()
+
+        if instance is not _MISSING:
+            return instance
+
+        try:
+            return self._factory(*args, **kwargs)
+        except BaseException:
+            self.discard()
+            raise
+
+    def put(self, instance: Any):
+        """Return a borrowed `instance` to the pool."""
+        with self._available:
+            self._idle.append(instance)
+            self._available.notify()
+
+    def discard(self, instance: Any = None):
+        """Drop a borrowed (e.g. broken) `instance`, making room for a new one."""
+        with self._available:
+            self._size -= 1
+            self._available.notify()
+
+    @contextmanager
+    def lease(self, *args, **kwargs) -> Iterator[Any]:
+        """Borrow an instance for the duration of the `with` block."""
+        instance = self.get(*args, **kwargs)
+        try:
+            yield instance
+        finally:
+            self.put(instance)
+
+    def clear(self):
+        """Drop the idle instances."""
+        with self._available:
+            self._size -= len(self._idle)
+            self._idle.clear()
+            self._available.notify_all()
+
+    def info(self) -> dict:
+        """Return the pool statistics (`hits`, `misses`, `waits`, `size`, `borrowed`, `max_size`)."""
+        with self._available:
+            return dict(
+                self._stats,
+                size=len(self._idle),
+                borrowed=self._size - len(self._idle),
+                max_size=self._max_size,
+            )
+
+    def _take(self) -> Any:
+        """
+        Pop an idle instance (waiting, under the condition, for one to be returned)
+        or return `_MISSING` once a new one can be built.
+        """
+        deadline = None if self._timeout is None else monotonic() + self._timeout
+        waiting = False
+
+        while len(self._idle) == 0:
+            if self._size < self._max_size:
+                self._size += 1
+                self._stats["misses"] += 1
+                return _MISSING
+
+            if waiting is False:
+                self._stats["waits"] += 1
+                waiting = True
+
+            timeout = None if deadline is None else deadline - monotonic()
+            if ((timeout is not None) and (timeout <= 0)) or (self._available.wait(timeout) is False):
+                raise TimeoutError(f"No pooled instance available in {self._timeout} seconds!")
+
+        self._stats["hits"] += 1
+        return self._idle.pop()
+
+
+def new_cache(policy: str, factory: Callable, **options) -> Union[MultitonCache, InstancePool]:
+    """Return the instance cache of `policy` for the instances built by `factory`."""
+    if policy == "shared":
+        return MultitonCache(factory, key=_shared_key)
+    if policy == "lru":
+        return MultitonCache(factory, max_size=options.get("max_size", 128), ttl=options.get("ttl"))
+    if policy == "pool":
+        return InstancePool(factory, max_size=options.get("max_size", 8), timeout=options.get("timeout"))
+    raise ValueError(f"Unknown caching policy '{policy}'!")
+
+
+def _shared_key(*args, **kwargs) -> None:
+    return None
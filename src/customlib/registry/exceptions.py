@@ -11,3 +11,13 @@ class DuplicateKeyError(RegistryKeyError):
 
 class MissingKeyError(RegistryKeyError):
     """Exception raised for missing registry keys."""
+
+
+class BatchError(Exception):
+    """Exception raised when some entries of a batch cannot be built."""
+
+    def __init__(self, *args, results: dict = None, errors: dict = None):
+        super(BatchError, self).__init__(*args)
+        # the instances built & the exceptions raised, by key (in the batch order)
+        self.results = results if results is not None else {}
+        self.errors = errors if errors is not None else {}
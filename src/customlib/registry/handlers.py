@@ -1,64 +1,371 @@
 # -*- coding: UTF-8 -*-
 
 from abc import ABC
-from typing import Any, Type
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from functools import partial
+from importlib import import_module
+from threading import RLock
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple, Type, Union
 
-from .exceptions import RegistryKeyError, DuplicateKeyError, MissingKeyError
+from .caches import POLICIES, InstancePool, new_cache
+from .exceptions import RegistryKeyError, DuplicateKeyError, MissingKeyError, BatchError
+from .index import KeyIndex
+from .. import forks
+
+try:  # python >= 3.8
+    from importlib.metadata import entry_points
+except ImportError:  # python 3.7 (needs the `importlib_metadata` backport)
+    try:
+        from importlib_metadata import entry_points
+    except ImportError:
+        entry_points = None
 
 
 class AbstractHandler(ABC):
+    """
+    Base class registry.
+
+    Each subclass has its own registry. The entries are kept in immutable
+    snapshots: writers copy the current one and publish the new one under
+    the writer lock, while readers (`get`) never take a lock, so entries can
+    be re-registered while other threads look them up.
+    """
 
-    __registry__: dict = {}
+    __registry__: Mapping[str, Any] = MappingProxyType({})
+    __caches__: Mapping[str, Any] = MappingProxyType({})
+    # trie of the dotted keys, published with the registry snapshots
+    __index__: KeyIndex = KeyIndex()
     __mutable__: bool = True
+    __lock = RLock()
+
+    def __init_subclass__(cls, **kwargs):
+        super(AbstractHandler, cls).__init_subclass__(**kwargs)
+        cls.__registry__ = MappingProxyType({})
+        cls.__caches__ = MappingProxyType({})
+        cls.__index__ = KeyIndex()
+        cls.__lock = RLock()
+        forks.register(cls)
 
     @classmethod
-    def register(cls, key: str):
+    def register(cls, key: str, cache: str = None, **options):
+        """
+        Register the decorated class under `key`.
+
+        With a `cache` policy (`shared`, `lru` or `pool`, see `caches.POLICIES`),
+        `get` reuses the instances instead of building one per call.
+        Options: `max_size`, `ttl` (`lru`) and `timeout` (`pool`).
+        """
+        if (cache is not None) and (cache not in POLICIES):
+            raise ValueError(f"Unknown caching policy '{cache}'!")
+
         def decorator(value: Type):
-            cls._set_entry(key, value)
+            with cls.__lock:
+                cls._set_entry(key, value)
+                cls._set_cache(key, cache, options)
             return value
         return decorator
 
+    @classmethod
+    def register_lazy(cls, key: str, path: str, cache: str = None, **options):
+        """
+        Register the class found at `path` (`package.module:ClassName`)
+        without importing it: the module is imported on the first `get`.
+        """
+        if (cache is not None) and (cache not in POLICIES):
+            raise ValueError(f"Unknown caching policy '{cache}'!")
+
+        entry = _LazyEntry(path)
+        with cls.__lock:
+            cls._set_entry(key, entry)
+            cls._set_cache(key, cache, options)
+
+    @classmethod
+    def discover(cls, group: str) -> List[str]:
+        """
+        Lazily register the entry points of `group` (declared by the installed
+        distributions), under their names. Returns the registered keys.
+        """
+        if entry_points is None:
+            raise ImportError("Entry points discovery requires the 'importlib_metadata' package!")
+
+        found = entry_points()
+        # python >= 3.10 returns selectable `EntryPoints`, older a dict of groups
+        found = found.select(group=group) if hasattr(found, "select") else found.get(group, ())
+
+        keys = []
+        for entry_point in found:
+            cls.register_lazy(entry_point.name, entry_point.value)
+            keys.append(entry_point.name)
+        return keys
+
     @classmethod
     def unregister(cls, key: str):
-        cls._del_entry(key)
+        with cls.__lock:
+            cls._del_entry(key)
+            cls._set_cache(key, None, {})
 
     @classmethod
     def get(cls, key: str, *args, **kwargs) -> Any:
+        cache = cls.__caches__.get(key)
+        if cache is not None:
+            return cache.get(*args, **kwargs)
+
         return cls._instance(
             cls._get_entry(key), *args, **kwargs
         )
 
+    @classmethod
+    def get_many(
+            cls,
+            requests: Mapping[str, Optional[Tuple[tuple, dict]]],
+            max_workers: int = 8,
+            executor: Union[str, Executor] = "thread",
+            return_exceptions: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        `get` several entries concurrently (for slow, I/O bound constructors).
+
+        Example:
+            handlers = ClassRegistry.get_many({
+                "db": (("postgres://...",), {"timeout": 5.0}),
+                "cache": ((), {}),
+                "queue": None,  # no arguments
+            })
+
+        :param requests: The `(args, kwargs)` to build each key with.
+        :param max_workers: The maximum number of entries built at the same time.
+        :param executor: `thread`, `process` or an existing `Executor` (not shut down).
+            Instances built in other processes are not cached (see `register`).
+        :param return_exceptions: Return the exceptions raised by the failed keys
+            as their results instead of raising a `BatchError`.
+        :return: The instances by key, in the order of `requests`.
+        :raise BatchError: If some entries cannot be built (with the `results` & `errors` by key).
+        """
+        if isinstance(executor, Executor):
+            outcomes = cls._run_many(executor, requests, max_workers)
+        elif executor in ("thread", "process"):
+            pool = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+            with pool(max_workers=max(1, min(max_workers, len(requests)))) as running:
+                outcomes = cls._run_many(running, requests, max_workers)
+        else:
+            raise ValueError(f"Unknown executor '{executor}'!")
+
+        if return_exceptions is True:
+            return outcomes
+
+        errors = {key: value for key, value in outcomes.items() if isinstance(value, BaseException)}
+        if len(errors) > 0:
+            results = {key: value for key, value in outcomes.items() if key not in errors}
+            raise BatchError(
+                f"Cannot build the entries with keys {list(errors)}!",
+                results=results,
+                errors=errors,
+            ) from next(iter(errors.values()))
+
+        return outcomes
+
+    @classmethod
+    def get_nearest(cls, key: str, *args, **kwargs) -> Any:
+        """`get` the entry of the longest registered prefix of `key` (`codec.json` for `codec.json.v3`)."""
+        return cls.get(cls.longest_prefix(key), *args, **kwargs)
+
+    @classmethod
+    def find(cls, pattern: str) -> List[str]:
+        """
+        Return the keys matching `pattern`, where `*` matches one dotted segment
+        and `**` any number of them (`codec.*`, `codec.**.v2`).
+        """
+        return cls.__index__.find(pattern)
+
+    @classmethod
+    def children(cls, prefix: str) -> List[str]:
+        """Return all the keys under `prefix` (`codec.json.v2` for `codec`)."""
+        return cls.__index__.children(prefix)
+
+    @classmethod
+    def longest_prefix(cls, key: str) -> str:
+        """Return the longest registered key that is `key` or one of its dotted prefixes."""
+        found = cls.__index__.longest_prefix(key)
+        if found is None:
+            raise MissingKeyError(
+                f"Cannot find any entry with key '{key}' or a prefix of it!"
+            )
+        return found
+
+    @classmethod
+    def release(cls, key: str, instance: Any):
+        """Return an `instance` borrowed with `get` to the pool of `key` (no-op for other policies)."""
+        cache = cls.__caches__.get(key)
+        if isinstance(cache, InstancePool):
+            cache.put(instance)
+
+    @classmethod
+    @contextmanager
+    def lease(cls, key: str, *args, **kwargs) -> Iterator[Any]:
+        """`get` an instance for the duration of the `with` block (and `release` it afterwards)."""
+        instance = cls.get(key, *args, **kwargs)
+        try:
+            yield instance
+        finally:
+            cls.release(key, instance)
+
+    @classmethod
+    def cache_info(cls, key: str = None) -> Union[dict, Dict[str, dict]]:
+        """
+        Return the statistics (with the `hit_rate`) of the instance cache of `key`
+        or, without `key`, of all the cached entries.
+        """
+        if key is None:
+            return {name: cls.cache_info(name) for name in tuple(cls.__caches__)}
+
+        cache = cls.__caches__.get(key)
+        if cache is None:
+            raise MissingKeyError(
+                f"Cannot find any cached entry with key '{key}'!"
+            )
+
+        info = cache.info()
+        lookups = info["hits"] + info["misses"]
+        info["hit_rate"] = info["hits"] / lookups if lookups > 0 else 0.0
+        return info
+
+    @classmethod
+    def cache_clear(cls, key: str = None):
+        """Drop the cached (idle) instances of `key` or, without `key`, of all the entries."""
+        caches = cls.__caches__
+        for cache in (caches.values() if key is None else (caches[key],)):
+            cache.clear()
+
+    @classmethod
+    def _run_many(cls, executor: Executor, requests: Mapping[str, Any], limit: int) -> Dict[str, Any]:
+        """Build the `requests` in `executor`, at most `limit` at a time."""
+        # processes build the (picklable) classes themselves, bypassing the instance caches
+        local = not isinstance(executor, ProcessPoolExecutor)
+
+        outcomes, pending = dict.fromkeys(requests), {}
+        queue = iter(requests.items())
+
+        def submit() -> bool:
+            item = next(queue, None)
+            if item is None:
+                return False
+
+            key, request = item
+            args, kwargs = request if request is not None else ((), {})
+            try:
+                if local is True:
+                    future = executor.submit(cls.get, key, *args, **kwargs)
+                else:
+                    future = executor.submit(cls._instance, cls._get_entry(key), *args, **kwargs)
+            except Exception as error:
+                outcomes[key] = error
+                return True
+
+            pending[future] = key
+            return True
+
+        while (len(pending) < max(1, limit)) and submit():
+            pass
+
+        while len(pending) > 0:
+            done, _ = wait(tuple(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                outcomes[key] = cls._outcome(future)
+                while (len(pending) < max(1, limit)) and submit():
+                    pass
+
+        return outcomes
+
+    @staticmethod
+    def _outcome(future: Future) -> Any:
+        error = future.exception()
+        return future.result() if error is None else error
+
+    @classmethod
+    def _after_fork(cls, default: str):
+        # the writer lock might be held by a thread that does not exist in the child
+        cls.__lock = RLock()
+
     @classmethod
     def _get_entry(cls, key: str) -> Type:
-        if key not in cls.__registry__:
+        # a single read of the current snapshot
+        value = cls.__registry__.get(key, _MISSING)
+        if value is _MISSING:
             raise MissingKeyError(
                 f"Cannot find any entry with key '{key}'!"
             )
-        return cls.__registry__.get(key)
+        if type(value) is _LazyEntry:
+            value = cls._resolve(key, value)
+        return value
 
     @classmethod
-    def _set_entry(cls, key: str, value: Type):
+    def _resolve(cls, key: str, entry: "_LazyEntry") -> Type:
+        value = entry.resolve()
+        with cls.__lock:
+            # cache the class, unless the key was registered again in the meantime
+            if cls.__registry__.get(key) is entry:
+                cls._publish(key, value)
+        return value
 
-        if (len(key) == 0) or (key is None):
+    @classmethod
+    def _set_entry(cls, key: str, value: Union[Type, "_LazyEntry"]):
+
+        if (key is None) or (len(key) == 0):
             raise RegistryKeyError(
                 f"Cannot register class '{value.__name__}' "
                 f"with an empty registry key '{key}'!"
             )
 
-        if (cls.__mutable__ is False) and (key in cls.__registry__):
-            raise DuplicateKeyError(
-                f"Duplicate key '{key}' found with class '{cls._get_entry(key).__name__}'!"
-            )
+        with cls.__lock:
+            if (cls.__mutable__ is False) and (key in cls.__registry__):
+                raise DuplicateKeyError(
+                    f"Duplicate key '{key}' found with class '{cls.__registry__[key].__name__}'!"
+                )
+
+            cls._publish(key, value)
+
+    @classmethod
+    def _set_cache(cls, key: str, policy: str, options: dict):
+        # a new registration always starts with a new (or no) cache
+        with cls.__lock:
+            caches = cls.__caches__.copy()
+            if policy is None:
+                if caches.pop(key, None) is None:
+                    return
+            else:
+                caches[key] = new_cache(policy, partial(cls._build, key), **options)
+            cls.__caches__ = MappingProxyType(caches)
+
+    @classmethod
+    def _publish(cls, key: str, value: Any = None, delete: bool = False):
+        """Publish a copy of the registry with `key` set to `value` (or deleted)."""
+        registry = cls.__registry__.copy()
+        if delete is True:
+            del registry[key]
+            cls.__index__ = cls.__index__.remove(key)
+        else:
+            if key not in registry:
+                cls.__index__ = cls.__index__.add(key)
+            registry[key] = value
+        cls.__registry__ = MappingProxyType(registry)
 
-        cls.__registry__.update({key: value})
+    @classmethod
+    def _build(cls, key: str, *args, **kwargs) -> Any:
+        return cls._instance(
+            cls._get_entry(key), *args, **kwargs
+        )
 
     @classmethod
     def _del_entry(cls, key: str):
-        if key not in cls.__registry__:
-            raise MissingKeyError(
-                f"Cannot find any entry with key '{key}'!"
-            )
-        cls.__registry__.pop(key)
+        with cls.__lock:
+            if key not in cls.__registry__:
+                raise MissingKeyError(
+                    f"Cannot find any entry with key '{key}'!"
+                )
+            cls._publish(key, delete=True)
 
     @classmethod
     def _instance(cls, value: Type, *args, **kwargs) -> Any:
@@ -79,9 +386,16 @@ class ClassRegistry(AbstractHandler):
 
         some_class = ClassRegistry.get("some_name", "var_value")
         print(some_class.var)
+
+        # the module is only imported by the first `get`:
+        ClassRegistry.register_lazy("other_name", "package.module:OtherClass")
+
+        # `get` returns the same instance for the same arguments:
+        @ClassRegistry.register("cached_name", cache="lru", max_size=64)
+        class CachedClass(object):
+            ...
     """
 
-    __registry__: dict = {}
     __mutable__: bool = False
 
 
@@ -101,3 +415,30 @@ class MutableClassRegistry(AbstractHandler):
         some_class = MutableClassRegistry.get("some_name", "var_value")
         print(some_class.var)
     """
+
+
+# sentinel for missing registry entries
+_MISSING = object()
+
+
+class _LazyEntry(object):
+    """Import path of a lazily registered class."""
+
+    __slots__ = ("__name__", "module", "qualname")
+
+    def __init__(self, path: str):
+        module, sep, qualname = path.partition(":")
+        if (len(module) == 0) or (len(qualname) == 0):
+            raise ValueError(f"Invalid import path '{path}' (expected 'package.module:ClassName')!")
+
+        self.__name__ = path
+        self.module, self.qualname = module, qualname
+
+    def resolve(self) -> Type:
+        value = import_module(self.module)
+        try:
+            for name in self.qualname.split("."):
+                value = getattr(value, name)
+        except AttributeError:
+            raise ImportError(f"Cannot import '{self.qualname}' from '{self.module}'!") from None
+        return value
@@ -0,0 +1,139 @@
+# -*- coding: UTF-8 -*-
+
+from typing import List, Optional
+
+# separator of the key segments (`codec.json.v2`)
+SEPARATOR: str = "."
+
+
+class KeyIndex(object):
+    """
+    Persistent (immutable) trie of the dotted registry keys.
+
+    `add` & `remove` return a new index sharing all the untouched nodes with this one
+    (only the nodes on the key's path are copied), so the registry publishes it with
+    its snapshots and readers never lock.
+
+    Lookups run in time proportional to the length of the key plus the number of results:
+        - `find("codec.*")`: the keys matching a pattern, where `*` matches one segment
+          and `**` any number of segments (`find("codec.**")`);
+        - `children("codec")`: all the keys under a prefix;
+        - `longest_prefix("codec.json.v3")`: the longest registered prefix of a key.
+    """
+
+    __slots__ = ("_root",)
+
+    def __init__(self, root: "_Node" = None):
+        self._root = root if root is not None else _EMPTY
+
+    def __contains__(self, key: str) -> bool:
+        node = self._walk(key.split(SEPARATOR))
+        return (node is not None) and (node.key is not None)
+
+    def add(self, key: str) -> "KeyIndex":
+        return KeyIndex(_add(self._root, key.split(SEPARATOR), 0, key))
+
+    def remove(self, key: str) -> "KeyIndex":
+        return KeyIndex(_remove(self._root, key.split(SEPARATOR), 0) or _EMPTY)
+
+    def find(self, pattern: str) -> List[str]:
+        """Return the keys matching `pattern` (`*` matches one segment, `**` any number)."""
+        segments = pattern.split(SEPARATOR)
+        found = []
+        _match(self._root, segments, 0, found)
+        # several `**` can reach the same key more than once
+        return list(dict.fromkeys(found)) if segments.count("**") > 1 else found
+
+    def children(self, prefix: str = "") -> List[str]:
+        """Return all the keys under `prefix` (all the keys without one)."""
+        node = self._walk(prefix.split(SEPARATOR)) if len(prefix) > 0 else self._root
+        if node is None:
+            return []
+
+        found, stack = [], list(reversed(node.children.values()))
+        while len(stack) > 0:
+            node = stack.pop()
+            if node.key is not None:
+                found.append(node.key)
+            stack.extend(reversed(node.children.values()))
+        return found
+
+    def longest_prefix(self, key: str) -> Optional[str]:
+        """Return the longest key that is `key` or one of its prefixes (`None` if none is)."""
+        node, found = self._root, None
+        for segment in key.split(SEPARATOR):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.key is not None:
+                found = node.key
+        return found
+
+    def _walk(self, segments: List[str]) -> Optional["_Node"]:
+        node = self._root
+        for segment in segments:
+            node = node.children.get(segment)
+            if node is None:
+                return None
+        return node
+
+
+class _Node(object):
+    """Trie node, never modified once built."""
+
+    __slots__ = ("children", "key")
+
+    def __init__(self, children: dict, key: Optional[str]):
+        self.children, self.key = children, key
+
+
+_EMPTY = _Node({}, None)
+
+
+def _add(node: _Node, segments: List[str], index: int, key: str) -> _Node:
+    if index == len(segments):
+        return _Node(node.children, key)
+
+    children = dict(node.children)
+    children[segments[index]] = _add(children.get(segments[index], _EMPTY), segments, index + 1, key)
+    return _Node(children, node.key)
+
+
+def _remove(node: _Node, segments: List[str], index: int) -> Optional[_Node]:
+    """Return the node without the key (`None` once it is empty)."""
+    if index == len(segments):
+        key, children = None, node.children
+    else:
+        child = node.children.get(segments[index])
+        if child is None:
+            return node
+
+        key, children = node.key, dict(node.children)
+        child = _remove(child, segments, index + 1)
+        if child is None:
+            del children[segments[index]]
+        else:
+            children[segments[index]] = child
+
+    return _Node(children, key) if (key is not None) or (len(children) > 0) else None
+
+
+def _match(node: _Node, segments: List[str], index: int, found: List[str]):
+    if index == len(segments):
+        if node.key is not None:
+            found.append(node.key)
+        return
+
+    segment = segments[index]
+    if segment == "**":
+        # zero segments, or one more & still in `**`
+        _match(node, segments, index + 1, found)
+        for child in node.children.values():
+            _match(child, segments, index, found)
+    elif segment == "*":
+        for child in node.children.values():
+            _match(child, segments, index + 1, found)
+    else:
+        child = node.children.get(segment)
+        if child is not None:
+            _match(child, segments, index + 1, found)
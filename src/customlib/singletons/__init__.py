@@ -1,5 +1,6 @@
 # -*- coding: UTF-8 -*-
 
-from .handlers import MetaSingleton, singleton
+from .handlers import MetaSingleton, singleton, MetaMultiton, MultitonCache, multiton
+from .proxies import LazyProxy
 
-__all__ = ["MetaSingleton", "singleton"]
+__all__ = ["MetaSingleton", "singleton", "MetaMultiton", "MultitonCache", "multiton", "LazyProxy"]
@@ -1,33 +1,425 @@
 # -*- coding: UTF-8 -*-
 
-from functools import wraps
+from collections import OrderedDict, deque
+from functools import lru_cache, partial, wraps
+from inspect import Signature, signature
+from itertools import chain
+from threading import Event, Lock, RLock
+from time import monotonic
+from typing import Any, Callable, Hashable, Optional
+from weakref import ref
 
 from .constants import INSTANCES
+from .proxies import LazyProxy, reset
+from .. import forks
+from ..forks import check_policy
 
 
 class MetaSingleton(type):
     """
     Singleton metaclass (for non-strict class).
     Restrict object to only one instance per runtime.
+
+    The instance is built once, under a per-class lock (double-checked),
+    and then returned through a plain attribute read.
+
+    With the `lazy` class keyword, a `LazyProxy` is returned instead and the
+    instance is only built on first use (or right away in a background thread
+    with `warm_up`):
+        class Client(object, metaclass=MetaSingleton, lazy=True, warm_up=False):
+            ...
+
+    The `fork` class keyword (`keep`, `reset` or `rebuild`) tells what happens
+    to the instance in forked children, once `customlib.forks.enable` was called.
     """
 
+    __lazy: bool = False
+    __warm_up: bool = False
+    __fork: str = None
+
+    def __new__(mcs, name: str, bases: tuple, namespace: dict, **options):
+        return super(MetaSingleton, mcs).__new__(mcs, name, bases, namespace)
+
+    def __init__(
+            cls,
+            name: str,
+            bases: tuple,
+            namespace: dict,
+            lazy: bool = None,
+            warm_up: bool = None,
+            fork: str = None,
+    ):
+        check_policy(fork)
+        super(MetaSingleton, cls).__init__(name, bases, namespace)
+        cls.__lock = RLock()
+
+        # subclasses inherit the options of their bases unless given
+        if lazy is not None:
+            cls.__lazy = lazy
+        if warm_up is not None:
+            cls.__warm_up = warm_up
+        if fork is not None:
+            cls.__fork = fork
+
+        forks.register(cls)
+
     def __call__(cls, *args, **kwargs):
-        if not hasattr(cls, "_instance"):
-            cls._instance = super(MetaSingleton, cls).__call__(*args, **kwargs)
-        return cls._instance
+        try:
+            return cls._instance
+        except AttributeError:
+            pass
+
+        with cls.__lock:
+            if not hasattr(cls, "_instance"):
+                cls.__factory = partial(super(MetaSingleton, cls).__call__, *args, **kwargs)
+                cls._instance = LazyProxy(cls.__factory, cls.__warm_up) if cls.__lazy is True else cls.__factory()
+            return cls._instance
+
+    def _after_fork(cls, default: str):
+        # the lock might be held by a thread that does not exist in the child
+        cls.__lock = RLock()
+
+        policy = cls.__fork if cls.__fork is not None else default
+        if ("_instance" not in cls.__dict__) or (policy == "keep"):
+            return
 
+        if type(cls._instance) is LazyProxy:
+            # reset in place, so the references to the proxy stay valid
+            reset(cls._instance, rebuild=policy == "rebuild")
+        elif policy == "rebuild":
+            cls._instance = cls.__factory()
+        else:
+            del cls._instance
 
-def singleton(cls):
+
+def singleton(cls=None, *, lazy: bool = False, warm_up: bool = False, fork: str = None):
     """
     Singleton decorator (for metaclass).
     Restrict object to only one instance per runtime.
+
+    The instance is built once, under a per-class lock (double-checked),
+    and then returned through a single lookup.
+
+    With `lazy` (`@singleton(lazy=True)`), a `LazyProxy` is returned instead and
+    the instance is only built on first use (or right away in a background thread
+    with `warm_up`).
+
+    `fork` (`keep`, `reset` or `rebuild`) tells what happens to the instance
+    in forked children, once `customlib.forks.enable` was called.
     """
+    check_policy(fork)
+
+    def decorator(klass):
+        state = _SingletonState(klass, lazy, warm_up, fork)
+
+        @wraps(klass)
+        def wrapper(*args, **kwargs):
+            instance = INSTANCES.get(klass)
+            if instance is None:
+                with state.lock:
+                    instance = INSTANCES.get(klass)
+                    if instance is None:
+                        # a strong reference to the object is required.
+                        instance = state.build(*args, **kwargs)
+                        INSTANCES[klass] = instance
+            return instance
+
+        # keeps the state (registered weakly for forks) alive with the wrapper
+        wrapper.__singleton__ = state
+        return wrapper
+
+    return decorator if cls is None else decorator(cls)
+
+
+class _SingletonState(object):
+    """Lock & options of a class decorated with `singleton`."""
+
+    __slots__ = ("klass", "lazy", "warm_up", "fork", "lock", "factory", "rebuilt", "__weakref__")
+
+    def __init__(self, klass: type, lazy: bool, warm_up: bool, fork: Optional[str]):
+        self.klass, self.lazy, self.warm_up, self.fork = klass, lazy, warm_up, fork
+        self.lock = RLock()
+        self.factory: Optional[Callable] = None
+        # the instances are only weakly referenced by `INSTANCES`,
+        # so the one rebuilt after a fork must be kept alive here
+        self.rebuilt = None
+        forks.register(self)
+
+    def build(self, *args, **kwargs) -> Any:
+        self.factory = partial(self.klass, *args, **kwargs)
+        return LazyProxy(self.factory, self.warm_up) if self.lazy is True else self.factory()
+
+    def _after_fork(self, default: str):
+        self.lock = RLock()
+
+        policy = self.fork if self.fork is not None else default
+        instance = INSTANCES.get(self.klass)
+        if (instance is None) or (policy == "keep"):
+            return
+
+        if type(instance) is LazyProxy:
+            reset(instance, rebuild=policy == "rebuild")
+        elif policy == "rebuild":
+            self.rebuilt = INSTANCES[self.klass] = self.factory()
+        else:
+            del INSTANCES[self.klass]
+
+
+class MultitonCache(object):
+    """
+    Instances of a class keyed by their (normalized) constructor arguments.
+
+    Arguments are bound to the constructor's signature, so positional, keyword
+    and default arguments naming the same configuration share one instance.
+    Each instance is built once, even when many threads ask for it at the same time.
+
+    Instances are evicted least recently used first above `max_size`,
+    expire `ttl` seconds after being built and, with `weak` retention,
+    are dropped as soon as nobody else references them.
+    """
+
+    def __init__(
+            self,
+            factory: Callable,
+            signature: Signature = None,
+            max_size: int = None,
+            ttl: float = None,
+            weak: bool = False,
+            key: Callable[..., Hashable] = None,
+            fork: str = None,
+    ):
+        check_policy(fork)
+        self._factory, self._signature = factory, signature
+        self._max_size, self._ttl, self._weak = max_size, ttl, weak
+        # binding the arguments is slow, so the keys of scalar arguments are memoized
+        # (but not with weak retention, the memo would keep the arguments alive)
+        self._key = key if key is not None else self.key if weak is True else self._cached_key
+        self._memo = lru_cache(maxsize=1024, typed=True)(self.key)
+
+        self._lock = Lock()
+        self._entries: OrderedDict = OrderedDict()
+        self._building: dict = {}
+        # weak entries whose instance is gone, purged on the next store
+        self._dead = deque()
+        self._stats = dict.fromkeys(("hits", "misses", "evictions", "expirations"), 0)
+
+        self._fork = fork
+        forks.register(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, *args, **kwargs) -> Hashable:
+        """Return the key of the instance built with these arguments."""
+        if self._signature is not None:
+            try:
+                bound = self._signature.bind(None, *args, **kwargs)
+            except TypeError:
+                pass
+            else:
+                bound.apply_defaults()
+                args, kwargs = bound.args[1:], bound.kwargs
+        return _freeze(args), _freeze(kwargs)
+
+    def _cached_key(self, *args, **kwargs) -> Hashable:
+        # `typed` only tells the types of the arguments themselves apart, not of their items
+        if all(type(value) in _SCALARS for value in chain(args, kwargs.values())):
+            return self._memo(*args, **kwargs)
+        return self.key(*args, **kwargs)
+
+    def get(self, *args, **kwargs) -> Any:
+        """Return the instance built with these arguments, building it if needed."""
+        key = self._key(*args, **kwargs)
+
+        while True:
+            with self._lock:
+                instance = self._lookup(key)
+                if instance is not _MISSING:
+                    self._stats["hits"] += 1
+                    return instance
+
+                building = self._building.get(key)
+                if building is None:
+                    self._stats["misses"] += 1
+                    building = self._building[key] = Event()
+                    break
+
+            # another thread is building it
+            building.wait()
 
-    @wraps(cls)
-    def wrapper(*args, **kwargs):
-        if cls not in INSTANCES:
-            # a strong reference to the object is required.
-            instance = cls(*args, **kwargs)
-            INSTANCES[cls] = instance
-        return INSTANCES[cls]
-    return wrapper
+        try:
+            instance = self._factory(*args, **kwargs)
+            with self._lock:
+                self._store(key, instance)
+            return instance
+        finally:
+            with self._lock:
+                del self._building[key]
+            building.set()
+
+    def invalidate(self, *args, **kwargs) -> bool:
+        """Drop the instance built with these arguments. Returns `False` if there is none."""
+        key = self._key(*args, **kwargs)
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        """Drop all the instances."""
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> dict:
+        """Return the cache statistics (`hits`, `misses`, `evictions`, `expirations`, `size`, `max_size`)."""
+        with self._lock:
+            return dict(self._stats, size=len(self._entries), max_size=self._max_size)
+
+    def _after_fork(self, default: str):
+        # the locks might be held by threads that do not exist in the child
+        self._lock, self._building = Lock(), {}
+
+        # there is no "rebuild" for multitons: the instances are only dropped
+        if (self._fork if self._fork is not None else default) != "keep":
+            self._entries.clear()
+
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+
+        instance, expires = entry
+        if (expires is not None) and (expires <= monotonic()):
+            del self._entries[key]
+            self._stats["expirations"] += 1
+            return _MISSING
+
+        if self._weak is True:
+            instance = instance()
+            if instance is None:
+                del self._entries[key]
+                return _MISSING
+
+        self._entries.move_to_end(key)
+        return instance
+
+    def _store(self, key: Hashable, instance: Any):
+        while len(self._dead) > 0:
+            dead_key, dead_ref = self._dead.popleft()
+            entry = self._entries.get(dead_key)
+            if (entry is not None) and (entry[0] is dead_ref):
+                del self._entries[dead_key]
+
+        if self._weak is True:
+            instance = ref(instance, lambda reference: self._dead.append((key, reference)))
+
+        expires = None if self._ttl is None else monotonic() + self._ttl
+        self._entries[key] = (instance, expires)
+
+        if self._max_size is not None:
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+
+class MetaMultiton(type):
+    """
+    Multiton metaclass: one instance per distinct set of constructor arguments.
+
+    Options are given as class keywords:
+        class Client(object, metaclass=MetaMultiton, max_size=128, ttl=60.0, weak=False):
+            ...
+
+    With `fork="reset"` (or a `reset` default given to `customlib.forks.enable`),
+    the instances are dropped in forked children.
+    """
+
+    def __new__(mcs, name: str, bases: tuple, namespace: dict, **options):
+        return super(MetaMultiton, mcs).__new__(mcs, name, bases, namespace)
+
+    def __init__(
+            cls,
+            name: str,
+            bases: tuple,
+            namespace: dict,
+            max_size: int = None,
+            ttl: float = None,
+            weak: bool = False,
+            key: Callable[..., Hashable] = None,
+            fork: str = None,
+    ):
+        super(MetaMultiton, cls).__init__(name, bases, namespace)
+        cls.__cache = MultitonCache(
+            partial(super(MetaMultiton, cls).__call__),
+            signature(cls.__init__),
+            max_size=max_size,
+            ttl=ttl,
+            weak=weak,
+            key=key,
+            fork=fork,
+        )
+
+    def __call__(cls, *args, **kwargs):
+        return cls.__cache.get(*args, **kwargs)
+
+    def invalidate(cls, *args, **kwargs) -> bool:
+        """Drop the instance built with these arguments."""
+        return cls.__cache.invalidate(*args, **kwargs)
+
+    def cache_clear(cls):
+        """Drop all the instances of this class."""
+        cls.__cache.clear()
+
+    def cache_info(cls) -> dict:
+        """Return the statistics of the instances cache."""
+        return cls.__cache.info()
+
+
+def multiton(
+        cls=None,
+        *,
+        max_size: int = None,
+        ttl: float = None,
+        weak: bool = False,
+        key: Callable = None,
+        fork: str = None,
+):
+    """
+    Multiton decorator: one instance per distinct set of constructor arguments.
+    Usable bare (`@multiton`) or with options (`@multiton(max_size=128, ttl=60.0)`).
+
+    The wrapper also exposes `invalidate(*args, **kwargs)`, `cache_clear()` and `cache_info()`.
+    """
+
+    def decorator(klass):
+        cache = MultitonCache(klass, signature(klass.__init__), max_size=max_size, ttl=ttl, weak=weak, key=key, fork=fork)
+
+        @wraps(klass)
+        def wrapper(*args, **kwargs):
+            return cache.get(*args, **kwargs)
+
+        wrapper.invalidate = cache.invalidate
+        wrapper.cache_clear = cache.clear
+        wrapper.cache_info = cache.info
+        return wrapper
+
+    return decorator if cls is None else decorator(cls)
+
+
+# sentinel for missing cache entries
+_MISSING = object()
+
+# argument types whose keys are memoized
+_SCALARS = frozenset((str, int, float, bool, bytes, type(None)))
+
+
+def _freeze(value: Any) -> Hashable:
+    """
+    Return a hashable equivalent of the (possibly unhashable) argument `value`,
+    tagged with its type, so equal values of different types (`1`, `1.0` & `True`) differ.
+    """
+    if isinstance(value, dict):
+        return type(value), tuple(sorted(((_freeze(k), _freeze(v)) for k, v in value.items()), key=repr))
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return type(value), frozenset(_freeze(item) for item in value)
+    return type(value), value
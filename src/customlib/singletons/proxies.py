@@ -0,0 +1,204 @@
+# -*- coding: UTF-8 -*-
+
+import math
+import operator
+from threading import Lock, Thread
+from typing import Any, Callable
+
+# sentinel for the not yet built object
+_MISSING = object()
+
+
+class LazyProxy(object):
+    """
+    Lightweight stand-in for an object built by `factory` on first use
+    (any attribute access or operator: comparison, container, numeric, `__index__`,
+    context manager & async protocols), under a lock, so it is built only once.
+
+    With `warm_up`, the object is built right away in a background thread,
+    so the first use does not pay for it (or only waits for the rest of it).
+    If the warm-up fails, the first use builds it again and raises the error.
+
+    `__wrapped__` returns the real object.
+    """
+
+    __slots__ = ("__factory", "__lock", "__target", "__weakref__")
+
+    def __init__(self, factory: Callable[[], Any], warm_up: bool = False):
+        object.__setattr__(self, "_LazyProxy__factory", factory)
+        object.__setattr__(self, "_LazyProxy__lock", Lock())
+        object.__setattr__(self, "_LazyProxy__target", _MISSING)
+
+        if warm_up is True:
+            Thread(target=self.__warm_up, name="LazyProxyWarmUp", daemon=True).start()
+
+    @property
+    def __wrapped__(self) -> Any:
+        target = self.__target
+        if target is _MISSING:
+            with self.__lock:
+                target = self.__target
+                if target is _MISSING:
+                    target = self.__factory()
+                    object.__setattr__(self, "_LazyProxy__target", target)
+        return target
+
+    # noinspection PyUnresolvedReferences
+    @property
+    def __class__(self) -> type:
+        return self.__wrapped__.__class__
+
+    def __warm_up(self):
+        try:
+            self.__wrapped__
+        except Exception:
+            pass
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.__wrapped__, name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self.__wrapped__, name, value)
+
+    def __delattr__(self, name: str):
+        delattr(self.__wrapped__, name)
+
+    def __dir__(self):
+        return dir(self.__wrapped__)
+
+    def __repr__(self) -> str:
+        return repr(self.__wrapped__)
+
+    def __str__(self) -> str:
+        return str(self.__wrapped__)
+
+    def __bytes__(self) -> bytes:
+        return bytes(self.__wrapped__)
+
+    def __format__(self, format_spec: str) -> str:
+        return format(self.__wrapped__, format_spec)
+
+    def __bool__(self) -> bool:
+        return bool(self.__wrapped__)
+
+    def __hash__(self) -> int:
+        return hash(self.__wrapped__)
+
+    def __eq__(self, other: Any) -> bool:
+        return self.__wrapped__ == other
+
+    def __ne__(self, other: Any) -> bool:
+        return self.__wrapped__ != other
+
+    def __lt__(self, other: Any) -> bool:
+        return self.__wrapped__ < other
+
+    def __le__(self, other: Any) -> bool:
+        return self.__wrapped__ <= other
+
+    def __gt__(self, other: Any) -> bool:
+        return self.__wrapped__ > other
+
+    def __ge__(self, other: Any) -> bool:
+        return self.__wrapped__ >= other
+
+    def __len__(self) -> int:
+        return len(self.__wrapped__)
+
+    def __iter__(self):
+        return iter(self.__wrapped__)
+
+    def __contains__(self, item: Any) -> bool:
+        return item in self.__wrapped__
+
+    def __getitem__(self, key: Any) -> Any:
+        return self.__wrapped__[key]
+
+    def __setitem__(self, key: Any, value: Any):
+        self.__wrapped__[key] = value
+
+    def __delitem__(self, key: Any):
+        del self.__wrapped__[key]
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.__wrapped__(*args, **kwargs)
+
+    def __enter__(self) -> Any:
+        return self.__wrapped__.__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self.__wrapped__.__exit__(exc_type, exc_val, exc_tb)
+
+    def __aenter__(self) -> Any:
+        return self.__wrapped__.__aenter__()
+
+    def __aexit__(self, exc_type, exc_val, exc_tb) -> Any:
+        return self.__wrapped__.__aexit__(exc_type, exc_val, exc_tb)
+
+    def __await__(self):
+        return self.__wrapped__.__await__()
+
+    def __aiter__(self) -> Any:
+        return self.__wrapped__.__aiter__()
+
+    def __anext__(self) -> Any:
+        return self.__wrapped__.__anext__()
+
+    def __reversed__(self):
+        return reversed(self.__wrapped__)
+
+    def __round__(self, ndigits: int = None) -> Any:
+        return round(self.__wrapped__, ndigits)
+
+
+def _unary(operation: Callable[[Any], Any]) -> Callable:
+    def method(self):
+        return operation(self.__wrapped__)
+    return method
+
+
+def _binary(operation: Callable[[Any, Any], Any]) -> Callable:
+    def method(self, other):
+        return operation(self.__wrapped__, other)
+    return method
+
+
+def _reflected(operation: Callable[[Any, Any], Any]) -> Callable:
+    def method(self, other):
+        return operation(other, self.__wrapped__)
+    return method
+
+
+# the numeric protocol (special methods are looked up on the type, so `__getattr__` misses them)
+for _name, _operation in (
+        ("neg", operator.neg), ("pos", operator.pos), ("abs", operator.abs), ("invert", operator.invert),
+        ("int", int), ("float", float), ("complex", complex), ("index", operator.index),
+        ("trunc", math.trunc), ("floor", math.floor), ("ceil", math.ceil),
+):
+    setattr(LazyProxy, f"__{_name}__", _unary(_operation))
+
+for _name, _operation in (
+        ("add", operator.add), ("sub", operator.sub), ("mul", operator.mul), ("matmul", operator.matmul),
+        ("truediv", operator.truediv), ("floordiv", operator.floordiv), ("mod", operator.mod),
+        ("divmod", divmod), ("pow", pow), ("lshift", operator.lshift), ("rshift", operator.rshift),
+        ("and", operator.and_), ("xor", operator.xor), ("or", operator.or_),
+):
+    setattr(LazyProxy, f"__{_name}__", _binary(_operation))
+    setattr(LazyProxy, f"__r{_name}__", _reflected(_operation))
+
+for _name in ("add", "sub", "mul", "matmul", "truediv", "floordiv", "mod", "pow", "lshift", "rshift", "and", "xor", "or"):
+    # in place on mutable objects, otherwise the name is bound to the result (like the object would)
+    setattr(LazyProxy, f"__i{_name}__", _binary(getattr(operator, f"i{_name}")))
+
+
+def reset(proxy: LazyProxy, rebuild: bool = False):
+    """
+    Forget the object built by `proxy` (and its lock, which might be held by a thread
+    that no longer exists after a fork), so the next use builds a new one,
+    or build it again right away with `rebuild`.
+    """
+    object.__setattr__(proxy, "_LazyProxy__lock", Lock())
+    object.__setattr__(proxy, "_LazyProxy__target", _MISSING)
+
+    if rebuild is True:
+        proxy.__wrapped__
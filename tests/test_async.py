@@ -0,0 +1,105 @@
+# -*- coding: UTF-8 -*-
+
+import asyncio
+import sys
+from subprocess import PIPE, Popen
+from threading import Event, Thread
+from time import monotonic, sleep
+
+import pytest
+
+from customlib.filehandlers import AsyncFileHandler, FileHandler
+
+fcntl = pytest.importorskip("fcntl")
+
+HOLDER = """
+import fcntl, sys, time
+with open(sys.argv[1], "a") as handle:
+    fcntl.flock(handle, fcntl.LOCK_EX)
+    print("locked", flush=True)
+    time.sleep(float(sys.argv[2]))
+"""
+
+
+def test_loop_stays_responsive_while_another_process_holds_the_lock(tmp_path):
+    path, hold = str(tmp_path / "locked.txt"), 0.5
+
+    holder = Popen([sys.executable, "-c", HOLDER, path, str(hold)], stdout=PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == "locked"
+        locked_at = monotonic()
+
+        async def main() -> tuple:
+            gaps, running = [], True
+
+            async def ticker():
+                last = monotonic()
+                while running:
+                    await asyncio.sleep(0.005)
+                    now = monotonic()
+                    gaps.append(now - last)
+                    last = now
+
+            task = asyncio.create_task(ticker())
+            try:
+                async with AsyncFileHandler(path, "a", encoding="UTF-8") as fh:
+                    acquired_at = monotonic()
+                    await fh.write("written once the holder released the lock\n")
+            finally:
+                running = False
+                await task
+            return acquired_at, max(gaps), len(gaps)
+
+        acquired_at, max_gap, ticks = asyncio.run(main())
+    finally:
+        holder.wait(timeout=10)
+
+    # the handler only got the lock after the other process released it...
+    assert acquired_at - locked_at >= hold * 0.8
+    # ...while the loop kept running its other tasks
+    assert ticks > 10
+    assert max_gap < 0.1
+
+    with open(path, encoding="UTF-8") as handle:
+        assert handle.read() == "written once the holder released the lock\n"
+
+
+def test_async_writer_is_not_starved_by_sync_readers(tmp_path):
+    path = str(tmp_path / "shared.txt")
+    with open(path, "w", encoding="UTF-8") as handle:
+        handle.write("data\n")
+
+    running = Event()
+    running.set()
+
+    def reader():
+        # overlapping shared holds: the lock is never free of readers
+        while running.is_set():
+            with FileHandler(path, "r", encoding="UTF-8") as handle:
+                handle.read()
+                sleep(0.005)
+
+    readers = [Thread(target=reader, daemon=True) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    sleep(0.05)
+
+    async def write() -> float:
+        started = monotonic()
+        fh = AsyncFileHandler(path, "a", encoding="UTF-8")
+        async with fh:
+            await fh.write("appended\n")
+        return monotonic() - started
+
+    try:
+        waited = asyncio.run(asyncio.wait_for(write(), timeout=3.0))
+    finally:
+        running.clear()
+        for thread in readers:
+            thread.join(timeout=1.0)
+
+    # the queued writer holds back new readers, as a blocking one would
+    assert waited < 1.0
+
+    with open(path, encoding="UTF-8") as handle:
+        assert handle.read() == "data\nappended\n"
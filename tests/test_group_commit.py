@@ -0,0 +1,55 @@
+# -*- coding: UTF-8 -*-
+
+from threading import Barrier, Lock, Thread
+from time import sleep
+
+import pytest
+
+from customlib.filehandlers import utils
+from customlib.filehandlers.utils import GroupCommitter
+
+WRITERS = 16
+
+
+def _run(monkeypatch, delay: float, batch: int) -> list:
+    """Commit from many writers at once, return the number of writes covered by each `fsync`."""
+    written, synced, errors = [0], [], []
+    counter = Lock()
+
+    def fsync(fd: int):
+        # the writes done before the `fsync` started are durable once it returns
+        covered = written[0]
+        sleep(0.01)
+        synced.append(covered)
+
+    monkeypatch.setattr(utils, "fsync", fsync)
+    committer, barrier = GroupCommitter(), Barrier(WRITERS)
+
+    def writer():
+        barrier.wait()
+        with counter:
+            written[0] += 1
+            mine = written[0]
+        committer.commit(0, delay, batch)
+        if not any(covered >= mine for covered in list(synced)):
+            errors.append(mine)
+
+    threads = [Thread(target=writer) for _ in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == [], "commit returned before an fsync covered its write"
+    return synced
+
+
+@pytest.mark.parametrize("batch", [1, 2, 5])
+def test_each_fsync_covers_at_most_batch_writers(monkeypatch, batch):
+    synced = _run(monkeypatch, 0.2, batch)
+    assert len(synced) == -(-WRITERS // batch)
+
+
+def test_writers_share_fsync_calls(monkeypatch):
+    synced = _run(monkeypatch, 0.2, 64)
+    assert len(synced) < WRITERS // 2
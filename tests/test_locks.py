@@ -0,0 +1,97 @@
+# -*- coding: UTF-8 -*-
+
+from threading import Event, Thread
+from time import sleep
+
+from customlib.filehandlers import FileHandler
+from customlib.filehandlers.locks import ReadWriteLock
+
+
+def test_nested_shared_lock_with_waiting_writer():
+    lock = ReadWriteLock("writers")
+    lock.acquire(shared=True)
+
+    writer = Thread(target=lambda: (lock.acquire(), lock.release()), daemon=True)
+    writer.start()
+    while lock._waiting_writers == 0:
+        sleep(0.001)
+
+    # the same thread takes the shared lock again, ahead of the waiting writer
+    assert lock.acquire(shared=True, timeout=1.0) is True
+    lock.release(shared=True)
+    lock.release(shared=True)
+
+    writer.join(timeout=1.0)
+    assert not writer.is_alive()
+
+
+def test_shared_lock_released_by_another_thread():
+    lock = ReadWriteLock()
+    lock.acquire(shared=True)
+
+    releaser = Thread(target=lock.release, args=(True,))
+    releaser.start()
+    releaser.join()
+
+    assert lock.acquire(blocking=False) is True
+    lock.release()
+
+
+def test_nested_file_readers_with_waiting_writer(tmp_path):
+    path = str(tmp_path / "nested.txt")
+    with FileHandler(path, "w", encoding="UTF-8") as fh:
+        fh.write("data")
+
+    done, written = Event(), Event()
+
+    def write():
+        with FileHandler(path, "a", encoding="UTF-8") as fh:
+            fh.write("more")
+        written.set()
+
+    def read():
+        handler = FileHandler(path, "r", encoding="UTF-8")
+        with handler:
+            writer = Thread(target=write, daemon=True)
+            writer.start()
+            while handler._thread_lock._lock._waiting_writers == 0:
+                sleep(0.001)
+
+            with FileHandler(path, "r", encoding="UTF-8") as inner:
+                assert inner.read() == "data"
+        done.set()
+
+    reader = Thread(target=read, daemon=True)
+    reader.start()
+
+    assert done.wait(5.0), "nested reader deadlocked behind the waiting writer"
+    assert written.wait(5.0)
+
+
+def test_queued_request_counts_as_waiting_writer():
+    lock = ReadWriteLock("writers")
+    lock.acquire(shared=True)
+
+    ticket = lock.enqueue()
+    assert ticket is not None and lock.poll(ticket) is False
+
+    # the queued writer holds back new readers of other threads
+    result = []
+    reader = Thread(target=lambda: result.append(lock.acquire(shared=True, blocking=False)))
+    reader.start()
+    reader.join()
+    assert result == [False]
+
+    # once cancelled, readers may join again
+    lock.cancel(ticket)
+    assert lock._waiting_writers == 0
+    reader = Thread(target=lambda: result.append(lock.acquire(shared=True, blocking=False)))
+    reader.start()
+    reader.join()
+    assert result == [False, True]
+    lock.release(shared=True)
+
+    ticket = lock.enqueue()
+    lock.release(shared=True)
+    assert lock.poll(ticket) is True
+    lock.release()
@@ -0,0 +1,42 @@
+# -*- coding: UTF-8 -*-
+
+import gc
+
+import pytest
+
+pytest.importorskip("fcntl")
+
+from customlib.filelockers import LOCK, CallbackSink, core, metrics
+
+
+@pytest.fixture
+def observed():
+    records = []
+    metrics.enable(CallbackSink(lambda path, metric, value: records.append(metric)))
+    yield records
+    metrics.disable()
+
+
+def test_closed_handle_leaves_no_stale_hold(tmp_path, observed):
+    path = tmp_path / "data.txt"
+    path.write_text("data")
+
+    # closing the handle releases the lock without `unlock`
+    handle = open(path, "r")
+    core.lock(handle, LOCK.EX)
+    handle.close()
+    del handle
+    gc.collect()
+
+    assert len(core._held) == 0
+
+    # a new handle (possibly with the same `id`) must not inherit the hold
+    for _ in range(10):
+        with open(path, "r") as handle:
+            core.unlock(handle)
+    assert "file_lock.hold" not in observed
+
+    with open(path, "r") as handle:
+        core.lock(handle, LOCK.SH)
+        core.unlock(handle)
+    assert observed.count("file_lock.hold") == 1
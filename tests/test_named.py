@@ -0,0 +1,160 @@
+# -*- coding: UTF-8 -*-
+
+from threading import Barrier, Event, Lock, Thread
+from time import sleep
+
+import pytest
+
+fcntl = pytest.importorskip("fcntl")
+
+from customlib.filehandlers import NamedLockManager
+from customlib.filelockers import AlreadyLocked
+
+
+def _locked_elsewhere(path: str) -> bool:
+    """Whether another open file description cannot take `LOCK.EX` on `path` right now."""
+    with open(path, "ab") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        return False
+
+
+def test_timeout_raises_already_locked(tmp_path):
+    manager = NamedLockManager(str(tmp_path))
+
+    # held by another thread of this process (in-process lock)
+    held, done = Event(), Event()
+
+    def holder():
+        with manager.exclusive("tenant-42"):
+            held.set()
+            done.wait()
+
+    thread = Thread(target=holder)
+    thread.start()
+    held.wait()
+    try:
+        with pytest.raises(AlreadyLocked):
+            manager.acquire("tenant-42", timeout=0.1)
+        with pytest.raises(AlreadyLocked):
+            manager.acquire("tenant-42", shared=True, timeout=0.1)
+    finally:
+        done.set()
+        thread.join()
+
+    # held by another manager, i.e. another open file description (file lock)
+    other = NamedLockManager(str(tmp_path))
+    with other.shared("tenant-42"):
+        with pytest.raises(AlreadyLocked):
+            manager.acquire("tenant-42", timeout=0.1)
+        with manager.shared("tenant-42", timeout=0.1):
+            pass
+
+    # the failed attempts left nothing pinned
+    with manager.exclusive("tenant-42", timeout=0.1):
+        pass
+    assert (len(manager._active), len(manager._idle)) == (0, 1)
+
+
+def test_nested_shared_holds_share_one_file_lock(tmp_path):
+    manager = NamedLockManager(str(tmp_path))
+    path = manager.path("cache:users")
+    barrier, first_released = Barrier(2), Event()
+    releases = {True: Event(), False: Event()}
+
+    def reader(first: bool):
+        with manager.shared("cache:users"):
+            barrier.wait()
+            releases[first].wait()
+        if first:
+            first_released.set()
+
+    threads = [Thread(target=reader, args=(first,)) for first in (True, False)]
+    for thread in threads:
+        thread.start()
+
+    while manager._active.get("cache:users") is None or manager._active["cache:users"].holders < 2:
+        sleep(0.001)
+    entry = manager._active["cache:users"]
+    assert entry.holders == 2 and _locked_elsewhere(path)
+
+    # the file lock is kept until the last holder leaves
+    releases[True].set()
+    first_released.wait()
+    assert entry.holders == 1 and _locked_elsewhere(path)
+
+    releases[False].set()
+    for thread in threads:
+        thread.join()
+    assert entry.holders == 0 and not _locked_elsewhere(path)
+
+    # a thread holding the shared lock may take it again
+    with manager.shared("cache:users"):
+        with manager.shared("cache:users", timeout=0.1):
+            assert entry.holders == 2
+
+
+def test_idle_descriptors_are_evicted_least_recently_used_first(tmp_path):
+    manager = NamedLockManager(str(tmp_path), max_open=2)
+
+    for name in ("a", "b", "c"):
+        with manager.exclusive(name):
+            pass
+    assert list(manager._idle) == ["b", "c"]
+
+    with manager.shared("b"):
+        assert list(manager._idle) == ["c"]
+    assert list(manager._idle) == ["c", "b"]
+
+    with manager.exclusive("a"):
+        pass
+    assert list(manager._idle) == ["b", "a"]
+
+    assert manager.close() == 2 and len(manager) == 0
+
+
+def test_cleanup_races_with_holders(tmp_path):
+    # without idle descriptors each acquisition reopens the lock file, racing with the cleanups
+    holders = [NamedLockManager(str(tmp_path), max_open=0, fanout=1) for _ in range(2)]
+    cleaner = NamedLockManager(str(tmp_path), fanout=1)
+    running, guard = True, Lock()
+    inside, overlaps, acquisitions, removed, errors = [0], [], [0], [0], []
+
+    def hold(manager: NamedLockManager):
+        try:
+            while running:
+                with manager.exclusive("tenant-42"):
+                    with guard:
+                        inside[0] += 1
+                        acquisitions[0] += 1
+                        if inside[0] > 1:
+                            overlaps.append(inside[0])
+                    sleep(0.0005)
+                    with guard:
+                        inside[0] -= 1
+                # leave the lock file unlocked now & then, for the cleanups to remove it
+                sleep(0.001)
+        except BaseException as error:
+            errors.append(error)
+
+    def clean():
+        try:
+            while running:
+                removed[0] += cleaner.cleanup()
+        except BaseException as error:
+            errors.append(error)
+
+    threads = [Thread(target=hold, args=(manager,)) for manager in holders] + [Thread(target=clean)]
+    for thread in threads:
+        thread.start()
+    sleep(1.0)
+    running = False
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert overlaps == [], "two holders got the exclusive lock at the same time"
+    assert acquisitions[0] > 100 and removed[0] > 0
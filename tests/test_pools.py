@@ -0,0 +1,60 @@
+# -*- coding: UTF-8 -*-
+
+import os
+from threading import Thread
+
+import pytest
+
+pytest.importorskip("fcntl")
+
+from customlib.filehandlers import FileHandler, HandlePool
+
+
+def _open_within(seconds: float, *args, **kwargs) -> bool:
+    """Open & close a handler in another thread, return whether it did so within `seconds`."""
+    def target():
+        with FileHandler(*args, **kwargs):
+            pass
+
+    worker = Thread(target=target, daemon=True)
+    worker.start()
+    worker.join(seconds)
+    return worker.is_alive() is False
+
+
+def test_idle_handle_does_not_stall_other_handlers(tmp_path):
+    path = str(tmp_path / "data.txt")
+    pool = HandlePool(idle_timeout=60.0)
+
+    with FileHandler(path, "a", pool=pool) as handle:
+        handle.write("pooled\n")
+    assert len(pool) == 1
+
+    # a handler without pool of this process must not wait for the reaper
+    assert _open_within(5.0, path, "a")
+    assert len(pool) == 0
+
+    with FileHandler(path, "r") as handle:
+        assert handle.read() == "pooled\n"
+
+
+def test_pool_keys_on_the_file(tmp_path):
+    path, link = str(tmp_path / "data.txt"), str(tmp_path / "link.txt")
+    with open(path, "w") as handle:
+        handle.write("data")
+    os.symlink(path, link)
+
+    pool, other = HandlePool(idle_timeout=60.0), HandlePool(idle_timeout=60.0)
+
+    with FileHandler(path, "r", pool=pool) as handle:
+        pooled = handle
+    # the same file through a symlink reuses the pooled handle
+    with FileHandler(link, "r", pool=pool) as handle:
+        assert handle is pooled
+    assert len(pool) == 1
+
+    # another pool writing through a hard link closes the idle handle
+    os.link(path, str(tmp_path / "hard.txt"))
+    assert _open_within(5.0, str(tmp_path / "hard.txt"), "a", pool=other)
+    assert (len(pool), len(other)) == (0, 1)
+    other.drain()
@@ -0,0 +1,134 @@
+# -*- coding: UTF-8 -*-
+
+import sys
+from threading import Event, Thread
+
+from customlib.registry import ClassRegistry, KeyIndex, MutableClassRegistry
+
+
+class Old(object):
+    pass
+
+
+class New(object):
+    pass
+
+
+def test_registries_are_isolated():
+
+    class Plugins(MutableClassRegistry):
+        pass
+
+    Plugins.register("isolated")(Old)
+
+    assert "isolated" in Plugins.__registry__
+    assert "isolated" not in MutableClassRegistry.__registry__
+    assert "isolated" not in ClassRegistry.__registry__
+
+
+def test_concurrent_lookups_during_registration():
+
+    class Plugins(MutableClassRegistry):
+        pass
+
+    keys = [f"plugin.{index}" for index in range(200)]
+    for key in keys:
+        Plugins.register(key)(Old)
+
+    stopped, errors, lookups = Event(), [], []
+
+    def reader():
+        count = 0
+        while not stopped.is_set():
+            for key in keys:
+                try:
+                    if not isinstance(Plugins.get(key), (Old, New)):
+                        errors.append(f"unexpected instance for '{key}'")
+                except Exception as error:
+                    errors.append(repr(error))
+                count += 1
+        lookups.append(count)
+
+    def writer(temporary: str):
+        for round_ in range(200):
+            for key in keys[::10]:
+                Plugins.register(key, cache="shared" if round_ % 2 else None)(New if round_ % 2 else Old)
+            # keys coming & going must not disturb the lookups of the others
+            Plugins.register(temporary)(Old)
+            Plugins.unregister(temporary)
+        stopped.set()
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        threads = [Thread(target=reader) for _ in range(8)]
+        threads += [Thread(target=writer, args=(f"temporary.{index}",)) for index in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    assert sum(lookups) >= 1000
+    assert set(Plugins.__registry__) == set(keys)
+
+
+KEYS = ("codec", "codec.json", "codec.json.v1", "codec.json.v2", "codec.xml.v2", "store.disk")
+
+
+def _index(keys=KEYS) -> KeyIndex:
+    index = KeyIndex()
+    for key in keys:
+        index = index.add(key)
+    return index
+
+
+def test_key_index_find():
+    index = _index()
+    assert sorted(index.find("codec.*")) == ["codec.json"]
+    assert sorted(index.find("codec.*.v2")) == ["codec.json.v2", "codec.xml.v2"]
+    assert sorted(index.find("codec.**")) == ["codec", "codec.json", "codec.json.v1", "codec.json.v2", "codec.xml.v2"]
+    assert sorted(index.find("**.v2")) == ["codec.json.v2", "codec.xml.v2"]
+    # several `**` reach the same keys along different paths, each is returned once
+    assert sorted(index.find("**.json.**")) == ["codec.json", "codec.json.v1", "codec.json.v2"]
+    assert sorted(index.find("**.**")) == sorted(KEYS)
+    assert index.find("codec.yaml.*") == []
+    assert index.find("store.disk") == ["store.disk"]
+
+
+def test_key_index_children_and_longest_prefix():
+    index = _index()
+    assert index.children("codec.json") == ["codec.json.v1", "codec.json.v2"]
+    assert sorted(index.children()) == sorted(KEYS)
+    assert index.children("missing") == []
+
+    assert index.longest_prefix("codec.json.v3") == "codec.json"
+    assert index.longest_prefix("codec.xml.v2") == "codec.xml.v2"
+    assert index.longest_prefix("codec.xml.v3") == "codec"
+    assert index.longest_prefix("store") is None
+
+
+def test_key_index_snapshots_are_persistent():
+    before = _index()
+    after = before.add("codec.yaml").remove("codec.json.v1").remove("store.disk")
+
+    # the old snapshot is left untouched
+    assert sorted(before.children()) == sorted(KEYS)
+    assert "codec.json.v1" in before and "codec.yaml" not in before
+    assert sorted(after.children()) == ["codec", "codec.json", "codec.json.v2", "codec.xml.v2", "codec.yaml"]
+
+    # emptied branches are pruned, inner keys keep their children
+    assert after.children("store") == [] and after.find("store.*") == []
+    assert "store" not in after and "store.disk" not in after
+    assert "store" not in after._root.children
+    assert after.remove("codec").children("codec") == ["codec.json", "codec.json.v2", "codec.xml.v2", "codec.yaml"]
+    assert after.remove("codec.json").find("codec.*") == ["codec.yaml"]
+    assert after._root.children["codec"].children["json"].key == "codec.json"
+
+    # removing a missing key returns an equivalent index
+    assert sorted(after.remove("missing.key").children()) == sorted(after.children())
+
+    empty = _index(("a.b",)).remove("a.b")
+    assert empty.children() == [] and len(empty._root.children) == 0
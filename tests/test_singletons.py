@@ -0,0 +1,127 @@
+# -*- coding: UTF-8 -*-
+
+import asyncio
+import gc
+import weakref
+from threading import Barrier, Thread
+from time import sleep
+
+from customlib.singletons import LazyProxy, MetaSingleton, MetaMultiton, singleton
+
+THREADS = 64
+
+
+def _race(factory) -> list:
+    """Call `factory` from many threads released at the same time and return the results."""
+    barrier, results = Barrier(THREADS), []
+
+    def worker():
+        barrier.wait()
+        results.append(factory())
+
+    threads = [Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+def test_meta_singleton_is_built_once_under_contention():
+    built = []
+
+    class Config(object, metaclass=MetaSingleton):
+        def __init__(self):
+            built.append(self)
+            # widen the race window
+            sleep(0.01)
+
+    results = _race(Config)
+
+    assert len(built) == 1
+    assert len(results) == THREADS
+    assert all(result is built[0] for result in results)
+
+
+def test_singleton_is_built_once_under_contention():
+    built = []
+
+    @singleton
+    class Config(object):
+        def __init__(self):
+            built.append(self)
+            sleep(0.01)
+
+    results = _race(Config)
+
+    assert len(built) == 1
+    assert len(results) == THREADS
+    assert all(result is built[0] for result in results)
+
+
+def test_multiton_keys_are_typed():
+    class Config(object, metaclass=MetaMultiton):
+
+        def __init__(self, value=None):
+            self.value = value
+
+    instances = [Config(1), Config(True), Config(1.0), Config(value=1), Config([1]), Config([True]), Config((1,))]
+    assert Config(1) is instances[0]
+    assert Config(value=True) is instances[1]
+    assert Config([1]) is instances[4]
+    assert len({id(instance) for instance in instances}) == 6
+    assert instances[3] is instances[0]
+
+
+def test_weak_multiton_arguments_are_not_retained():
+    class Token(object):
+        pass
+
+    class Session(object, metaclass=MetaMultiton, weak=True):
+
+        def __init__(self, token):
+            self.token = token
+
+    token = Token()
+    session = Session(token)
+    assert Session(token) is session
+
+    tokens = weakref.ref(token)
+    del token, session
+    gc.collect()
+    # dead entries are purged by the next store
+    Session(Token())
+    assert tokens() is None
+
+
+def test_lazy_proxy_forwards_the_numeric_protocol():
+    number = LazyProxy(lambda: 5)
+    assert (number + 1, 1 + number, number * 2, 7 // number, -number, abs(number)) == (6, 6, 10, 1, -5, 5)
+    assert ["a", "b", "c", "d", "e", "f"][number] == "f"
+    assert (int(number), float(number), round(number), divmod(number, 2)) == (5, 5.0, 5, (2, 1))
+
+    items = LazyProxy(list)
+    items += [1]
+    assert items == [1]
+
+    built = []
+    lazy = LazyProxy(lambda: built.append(True) or 3)
+    assert built == []
+    assert lazy ** 2 == 9 and built == [True]
+
+
+def test_lazy_proxy_forwards_the_async_protocols():
+    class Resource(object):
+
+        async def __aenter__(self):
+            return "entered"
+
+        async def __aexit__(self, exc_type, exc_val, exc_tb):
+            return False
+
+    async def main():
+        async with LazyProxy(Resource) as value:
+            return value
+
+    assert asyncio.run(main()) == "entered"
@@ -0,0 +1,35 @@
+# -*- coding: UTF-8 -*-
+
+from customlib.filehandlers import FileHandler
+
+
+def test_copy_to_append_handler(tmp_path):
+    source, target = str(tmp_path / "source.bin"), str(tmp_path / "target.bin")
+    data = bytes(range(256)) * 64
+
+    with FileHandler(source, "wb") as handle:
+        handle.write(data)
+    with FileHandler(target, "wb") as handle:
+        handle.write(b"head")
+
+    reader, appender = FileHandler(source, "rb"), FileHandler(target, "ab")
+    with reader, appender:
+        assert reader.copy_to(appender) == len(data)
+        appender.write(b"tail")
+
+    with FileHandler(target, "rb") as handle:
+        assert handle.read() == b"head" + data + b"tail"
+
+
+def test_copy_to_path(tmp_path):
+    source, target = str(tmp_path / "source.bin"), str(tmp_path / "target.bin")
+
+    with FileHandler(source, "wb") as handle:
+        handle.write(b"0123456789")
+
+    reader = FileHandler(source, "rb")
+    with reader:
+        assert reader.copy_to(target, offset=2, count=5) == 5
+
+    with FileHandler(target, "rb") as handle:
+        assert handle.read() == b"23456"
@@ -0,0 +1,29 @@
+# -*- coding: UTF-8 -*-
+
+from os.path import getsize
+from time import sleep
+
+from customlib.filehandlers import AppendWriter
+
+
+class SlowAppendWriter(AppendWriter):
+
+    def _write(self, buffers: list):
+        sleep(0.2)
+        super(SlowAppendWriter, self)._write(buffers)
+
+
+def test_flush_waits_for_the_batch_being_written(tmp_path):
+    path = str(tmp_path / "append.log")
+
+    with SlowAppendWriter(path, flush_interval=0.001) as writer:
+        for index in range(100):
+            writer.write(f"record {index}\n")
+
+        # let the background thread take the records off the queue
+        while writer.pending > 0:
+            sleep(0.001)
+
+        writer.flush()
+        assert writer.stats()["written"] == 100
+        assert getsize(path) == sum(len(f"record {index}\n") for index in range(100))